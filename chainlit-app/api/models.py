@@ -0,0 +1,39 @@
+"""
+Request body models for the REST API
+"""
+from typing import List, Optional
+from pydantic import BaseModel, Field
+
+
+class RequestBoxesIn(BaseModel):
+    """Body for POST /api/request-boxes"""
+    account_number: str = Field(min_length=1)
+    quantity: int = Field(gt=0)
+
+
+class SendEmailIn(BaseModel):
+    """Body for POST /api/send-email"""
+    to_email: str = Field(min_length=1)
+    subject: str = Field(min_length=1)
+    body_html: str = Field(min_length=1)
+    body_text: Optional[str] = None
+    cc: List[str] = []
+    bcc: List[str] = []
+
+
+class BoxConfirmationIn(BaseModel):
+    """Body for POST /api/send-box-confirmation"""
+    customer_email: str = Field(min_length=1)
+    customer_name: str = Field(min_length=1)
+    account_number: str = Field(min_length=1)
+    quantity: int = Field(gt=0)
+    address: str = Field(min_length=1)
+
+
+class BoxNotificationIn(BaseModel):
+    """Body for POST /api/send-box-notification"""
+    internal_email: str = Field(min_length=1)
+    customer_name: str = Field(min_length=1)
+    account_number: str = Field(min_length=1)
+    quantity: int = Field(gt=0)
+    address: str = Field(min_length=1)
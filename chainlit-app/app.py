@@ -20,12 +20,28 @@ if "CHAINLIT_SECRET_KEY" not in os.environ:
 # ============================================================================
 # IMPORTS
 # ============================================================================
-from typing import Optional
-from uuid import uuid4
+from typing import Optional, Callable, Awaitable, Tuple
+import itertools
+import re
+import time
+from contextlib import asynccontextmanager
 import asyncio
 import chainlit as cl
 from chainlit.logger import logger
 
+# Use uvloop for the event loop (Chainlit creates its loop after loading this module)
+try:
+    import uvloop
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    UVLOOP_AVAILABLE = True
+except ImportError:
+    UVLOOP_AVAILABLE = False
+
+if UVLOOP_AVAILABLE:
+    logger.info("✅ uvloop event loop policy installed")
+else:
+    logger.warning("⚠️ uvloop not available, using default asyncio event loop")
+
 # Custom OpenAI Realtime Client (from realtime module)
 try:
     from realtime import RealtimeClient
@@ -37,43 +53,161 @@ except ImportError as e:
     logger.warning(f"⚠️ Realtime Client not available: {e}. Voice features will be disabled.")
 
 # Local imports
-from db.queries import get_customer_account, get_box_inventory, update_box_request
-from services.email import send_box_request_confirmation, send_box_request_notification
+from db.queries import update_box_request_returning
+from db.async_pool import init_pool, close_pool
+from db.cache import (
+    cached_customer, cached_inventory, peek_customer, peek_inventory,
+    invalidate_account, init_redis, close_redis
+)
+from services.email import send_box_request_confirmation_async, send_box_request_notification_async, close_smtp_pool, close_http_client
+from services.tasks import enqueue_email
 
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
+# Email recipients for box requests
+TO_EMAIL = os.getenv("TO_EMAIL", "your email")
+INTERNAL_NOTIFICATION_EMAIL = os.getenv("INTERNAL_NOTIFICATION_EMAIL", "")
+
+# Output audio is coalesced into frames of this length before it goes to the browser
+AUDIO_FLUSH_SECONDS = float(os.getenv("AUDIO_FLUSH_MS", "30")) / 1000
+PCM_MIME = "audio/pcm"
+
+# Input audio is batched up to this many bytes per input_audio_buffer.append
+# (3200 bytes = ~67ms of 24kHz mono pcm16, ~3 browser chunks)
+AUDIO_INPUT_BATCH_BYTES = int(os.getenv("AUDIO_INPUT_BATCH_BYTES", "3200"))
+# Browser chunks waiting for the sender task; when full the oldest is dropped
+AUDIO_INPUT_QUEUE_SIZE = 64
+# How long on_audio_end waits for queued audio to go out before response.create
+AUDIO_END_DRAIN_SECONDS = 2.0
+
+# Tool response for query_customer_account (filled from the customer row)
+_CUST_TMPL = (
+    "Account Details for {account_number}:\n"
+    "- Customer Name: {customer_name}\n"
+    "- Company: {company_name}\n"
+    "- Address: {address}\n"
+    "- Phone: {phone_number}\n"
+    "- Email: {email}\n"
+    "- Boxes in Storage: {boxes_retained}\n"
+    "- Boxes Requested: {boxes_requested}"
+)
+
+# Account numbers in text chat: "IM-10001", "im10001", ...
+ACCOUNT_RE = re.compile(r'im-?(\d+)', re.IGNORECASE)
+
+# Text chat routing keywords, matched in one pass (group name = route)
+ROUTER_RE = re.compile(
+    r'(?P<acct>account|im-)|(?P<inv>inventory|how many|\bcount\b)|(?P<req>request|order|need)',
+    re.IGNORECASE
+)
+# When a message hits several routes, the first of these wins
+ROUTE_PRIORITY = ("acct", "inv", "req")
+
+# Input audio append failures are counted and reported at most this often (seconds)
+AUDIO_ERROR_LOG_INTERVAL = 5.0
+_audio_err_count = 0
+_audio_last_log = 0.0
+
+# Text-chat lookup replies (filled from the customer row)
+CUSTOMER_TMPL = (
+    "**Account Details for {acct}**\n"
+    "- **Customer:** {customer_name}\n"
+    "- **Company:** {company_name}\n"
+    "- **Address:** {address}\n"
+    "- **Phone:** {phone_number}\n"
+    "- **Email:** {email}\n"
+    "- **Boxes in Storage:** {boxes_retained}\n"
+    "- **Boxes Requested:** {boxes_requested}"
+)
+INVENTORY_TMPL = (
+    "**Box Inventory for {acct}**\n"
+    "- **Customer:** {customer_name}\n"
+    "- **Boxes in Storage:** {boxes_retained}\n"
+    "- **Boxes Requested:** {boxes_requested}"
+)
+
+# Canned text-chat replies
+WELCOME_CONTENT = (
+    "👋 **Welcome to Iron Mountain!**\n\n"
+    "I'm **IronAssist**, your virtual storage assistant.\n\n"
+    "I can help you with:\n"
+    "📦 **Check your account** - View your storage details\n"
+    "📊 **Box inventory** - See how many boxes you have with us\n"
+    "🚚 **Request empty boxes** - Order boxes for document storage\n\n"
+    + ("**🎤 Press `P` to talk, or " if REALTIME_AVAILABLE else "**")
+    + "Type your account number to get started!**\n\n"
+    "_Example: 'My account number is IM-10001'_"
+)
+REQUEST_BOXES_PROMPT = (
+    "📦 To request boxes, please provide:\n"
+    "1. Your account number (e.g., IM-10001)\n"
+    "2. Number of boxes needed\n\n"
+    "Or use voice by pressing **P**!"
+)
+DEFAULT_HELP = (
+    "I can help you with:\n"
+    "- Checking your account (provide account number like IM-10001)\n"
+    "- Checking box inventory\n"
+    "- Requesting empty boxes\n\n"
+    "**Or press P to use voice!**"
+)
+
+# Audio track ids only need to be unique within this process
+_track_seq = itertools.count(1)
+
+
+def next_track_id() -> str:
+    """Return a new output audio track id"""
+    return f"t{next(_track_seq)}"
+
+
+def _first_name(name: Optional[str]) -> str:
+    """First word of a customer name for greetings, or "there" if it's empty"""
+    return (name or "").partition(" ")[0] or "there"
+
+
 # Enable Chainlit data persistence
 os.environ.setdefault("CHAINLIT_DATA_PERSISTENCE", "true")
 logger.info("🗄️  Chainlit data persistence enabled with default file-based storage")
 
-# Initialize database on startup
-try:
-    from db.connection import get_db_connection
-    conn = get_db_connection()
-    if conn:
-        conn.close()
-        logger.info("✅ Database initialized and ready")
-    else:
-        logger.warning("⚠️ Database connection failed")
-except Exception as e:
-    logger.error(f"❌ Database initialization error: {e}")
-
 
 # ============================================================================
-# REST API ROUTES (from api folder)
+# APP ROUTES (REST API from api folder + cancellation service)
 # ============================================================================
-try:
-    import chainlit.server as cl_server
-    from api.routes import router
-    
-    app = None
-    if hasattr(cl_server, 'app'):
-        app = cl_server.app
-    elif hasattr(cl_server, 'chainlit_app'):
-        app = cl_server.chainlit_app
-    
-    if app:
+def _get_chainlit_app():
+    """Return Chainlit's FastAPI app, or None if it can't be found"""
+    try:
+        import chainlit.server as cl_server
+    except Exception as e:
+        logger.warning(f"⚠️ Could not import Chainlit server: {e}")
+        return None
+    return getattr(cl_server, 'app', None) or getattr(cl_server, 'chainlit_app', None)
+
+
+app = _get_chainlit_app()
+
+if app:
+    try:
+        from fastapi.responses import ORJSONResponse
+        from api.routes import router
+        
+        # Open/close the async SQLite pool and Redis around Chainlit's own lifespan
+        chainlit_lifespan = app.router.lifespan_context
+
+        @asynccontextmanager
+        async def lifespan(app):
+            # Independent connections - start them concurrently
+            app.state.pool, app.state.redis = await asyncio.gather(init_pool(), init_redis())
+            try:
+                async with chainlit_lifespan(app) as state:
+                    yield state
+            finally:
+                await asyncio.gather(close_pool(), close_redis(), close_smtp_pool(), close_http_client())
+
+        app.router.lifespan_context = lifespan
+        logger.info("✅ SQLite pool and Redis cache registered with app lifespan")
+
         # Include API router
         app.include_router(router)
         logger.info("✅ REST API routes added from api/routes.py")
@@ -81,28 +215,158 @@ try:
         logger.info("   - GET /api/inventory/{account_number}")
         logger.info("   - POST /api/request-boxes")
         logger.info("   - GET /api/health")
-except Exception as e:
-    logger.warning(f"⚠️ Could not add REST API routes: {e}")
 
-        
-# ============================================================================
-# CANCELLATION SERVICE ROUTES
-# ============================================================================
-try:
-    import chainlit.server as cl_server
-    from services.cancellation import register_cancellation_routes
-    
-    app = None
-    if hasattr(cl_server, 'app'):
-        app = cl_server.app
-    elif hasattr(cl_server, 'chainlit_app'):
-        app = cl_server.chainlit_app
+        # Single JSON error handler instead of per-route try/except. It sits on
+        # Chainlit's app, so anything outside /api keeps Chainlit's own handling
+        @app.exception_handler(Exception)
+        async def unhandled_exception_handler(request, exc):
+            if not request.url.path.startswith(router.prefix):
+                raise exc
+            logger.exception(f"Error in {request.method} {request.url.path}: {exc}")
+            # Details stay in the log - SQL, paths and driver messages aren't for clients
+            return ORJSONResponse({
+                "status": "error",
+                "message": "Internal server error"
+            }, status_code=500)
+    except Exception as e:
+        logger.warning(f"⚠️ Could not add REST API routes: {e}")
     
-    if app:
+    try:
+        from services.cancellation import register_cancellation_routes
         register_cancellation_routes(app)
         logger.info("✅ Cancellation service routes added")
-except Exception as e:
-    logger.warning(f"⚠️ Could not add cancellation routes: {e}")
+    except Exception as e:
+        logger.warning(f"⚠️ Could not add cancellation routes: {e}")
+
+
+# ============================================================================
+# VOICE SESSION CONFIGURATION
+# ============================================================================
+VOICE_INSTRUCTIONS = (
+    "You are IronAssist, a professional multilingual voice assistant for Iron Mountain, "
+    "the world's leading information management company.\n\n"
+    "ABOUT IRON MOUNTAIN:\n"
+    "- Global leader in storage and information management since 1951\n"
+    "- Trusted by 95% of Fortune 1000 companies\n"
+    "- Services: Document storage, box delivery, secure records management\n\n"
+    "YOUR ROLE:\n"
+    "- Help customers check their account and storage inventory\n"
+    "- Process requests for empty storage boxes\n"
+    "- Provide professional, efficient service\n"
+    "- Support customers in their preferred language\n\n"
+    "CRITICAL WORKFLOW - ACCOUNT VERIFICATION:\n"
+    "When you retrieve customer account information (using query_customer_account tool):\n"
+    "1. ALWAYS welcome the customer by their FIRST NAME (extract from customer_name)\n"
+    "2. ALWAYS confirm their address to ensure it's correct before proceeding\n"
+    "3. Say something like: 'Hi [First Name]! I have your address on file as [address]. Is this still correct?'\n"
+    "4. Wait for confirmation before processing any box requests or deliveries\n"
+    "5. If address is wrong, acknowledge and note that they may need to update it\n"
+    "6. This verification step is MANDATORY for security and accuracy\n\n"
+    "EXAMPLE CONVERSATION:\n"
+    "User: 'My account is IM-10001'\n"
+    "You: [After query_customer_account] 'Hi John! Welcome back to Iron Mountain. I have your address on file as 123 Main St, New York, NY 10001. Is this still the correct delivery address for you?'\n"
+    "User: 'Yes, that's correct'\n"
+    "You: 'Perfect! How can I help you today?'\n\n"
+    "IMPORTANT RULES:\n"
+    "- Always verify account number before providing sensitive information\n"
+    "- ALWAYS welcome customers by first name after retrieving their account\n"
+    "- ALWAYS confirm address before processing any delivery requests\n"
+    "- Be clear about delivery timeframes (3-5 business days)\n"
+    "- Stay professional but friendly\n"
+    "- Keep the conversation flowing naturally during all operations\n"
+)
+
+# Turn detection: "server_vad" (silence based) or "semantic_vad" (waits for the
+# user to finish their thought - fewer false interruptions on backchannels)
+VAD_MODE = os.getenv("VAD_MODE", "server_vad")
+VAD_INTERRUPT = os.getenv("VAD_INTERRUPT", "1") == "1"  # Allow user to interrupt assistant
+
+# semantic_vad: how quickly to end the turn (low | medium | high | auto)
+VAD_EAGERNESS = os.getenv("VAD_EAGERNESS", "medium")
+
+# server_vad tuning - silence_duration_ms is the main end-of-turn latency knob
+VAD_THRESHOLD = float(os.getenv("VAD_THRESHOLD", "0.5"))  # 0.0-1.0, higher = less sensitive
+VAD_PREFIX_MS = int(os.getenv("VAD_PREFIX_MS", "200"))  # Padding kept before speech starts
+VAD_SILENCE_MS = int(os.getenv("VAD_SILENCE_MS", "300"))  # Silence before speech is considered ended
+
+if VAD_MODE == "semantic_vad":
+    TURN_DETECTION = {
+        "type": "semantic_vad",
+        "eagerness": VAD_EAGERNESS,
+        "create_response": True,
+        "interrupt_response": VAD_INTERRUPT,
+    }
+else:
+    TURN_DETECTION = {
+        "type": "server_vad",
+        "create_response": True,
+        "interrupt_response": VAD_INTERRUPT,
+        "threshold": VAD_THRESHOLD,
+        "prefix_padding_ms": VAD_PREFIX_MS,
+        "silence_duration_ms": VAD_SILENCE_MS,
+    }
+
+# Sent with session.update once per voice connection
+VOICE_SESSION_CONFIG = {
+    "turn_detection": TURN_DETECTION,
+    "modalities": ["audio", "text"],
+    "input_audio_format": "pcm16",
+    "output_audio_format": "pcm16",
+    "voice": "echo",
+    "temperature": 0.6,
+    "instructions": VOICE_INSTRUCTIONS,
+}
+
+# Tool schemas sent to the Realtime API - handlers are bound per session in
+# setup_openai_realtime()
+TOOL_DEFINITIONS = [
+    {
+        "name": "query_customer_account",
+        "description": "Look up customer account details by account number. Use this when customer provides their account number or wants to check their account.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "account_number": {
+                    "type": "string",
+                    "description": "Customer account number in format IM-XXXXX"
+                }
+            },
+            "required": ["account_number"]
+        }
+    },
+    {
+        "name": "check_box_inventory",
+        "description": "Check how many boxes a customer has in storage. Use this when customer asks about their box count or inventory.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "account_number": {
+                    "type": "string",
+                    "description": "Customer account number"
+                }
+            },
+            "required": ["account_number"]
+        }
+    },
+    {
+        "name": "request_empty_boxes",
+        "description": "Request empty storage boxes for delivery to customer. Use this when customer wants to order boxes. This will update database directly.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "account_number": {
+                    "type": "string",
+                    "description": "Customer account number"
+                },
+                "quantity": {
+                    "type": "integer",
+                    "description": "Number of empty boxes to request"
+                }
+            },
+            "required": ["account_number", "quantity"]
+        }
+    }
+]
 
 
 # ============================================================================
@@ -122,6 +386,55 @@ async def auth_callback(username: str, password: str) -> Optional[cl.User]:
 # ============================================================================
 # OPENAI REALTIME VOICE SETUP
 # ============================================================================
+def _customer_found(account_number: str, customer: dict) -> Tuple[str, str]:
+    """(chat message, tool response) for query_customer_account"""
+    response = _CUST_TMPL.format_map(customer | {"account_number": account_number})
+    # Personalized welcome
+    return f"👋 Welcome back, {_first_name(customer['customer_name'])}!", response
+
+
+def _inventory_found(account_number: str, inventory: dict) -> Tuple[str, str]:
+    """(chat message, tool response) for check_box_inventory"""
+    boxes_retained = inventory['boxes_retained']
+    boxes_requested = inventory['boxes_requested']
+    if boxes_requested > 0:
+        response = f"Customer {inventory['customer_name']} has {boxes_retained} boxes currently in storage and {boxes_requested} boxes requested for delivery."
+    else:
+        response = f"Customer {inventory['customer_name']} has {boxes_retained} boxes currently in storage with no pending delivery requests."
+    return f"✅ Found {boxes_retained} boxes in storage, {boxes_requested} requested", response
+
+
+def _make_lookup_tool(
+    tool_name: str,
+    lookup: Callable[[str], Awaitable[Optional[dict]]],
+    on_found: Callable[[str, dict], Tuple[str, str]],
+    not_found_msg: str,
+    not_found_reply: str,
+    error_reply: str,
+):
+    """Build a read-only voice tool: look the account up, post a chat message, answer the model"""
+    async def tool(account_number: str) -> str:
+        try:
+            row = await lookup(account_number)
+            
+            if not row:
+                logger.warning(f"❌ Account not found: {account_number}")
+                await cl.Message(content=not_found_msg).send()
+                return not_found_reply.format(account_number=account_number)
+            
+            message, response = on_found(account_number, row)
+            await cl.Message(content=message).send()
+            
+            logger.debug("tool=%s acc=%s", tool_name, account_number)
+            return response
+        except Exception as e:
+            logger.error(f"❌ Error in {tool_name}: {e}", exc_info=True)
+            return error_reply
+    
+    tool.__name__ = tool_name
+    return tool
+
+
 async def setup_openai_realtime():
     """Setup OpenAI Realtime Client with direct SQLite tools"""
     if not REALTIME_AVAILABLE:
@@ -139,76 +452,107 @@ async def setup_openai_realtime():
         logger.error(f"⚠️ Failed to initialize RealtimeClient: {e}", exc_info=True)
         return None
     
-    # Set up track ID for audio streaming
-    track_id = str(uuid4())
-    cl.user_session.set("track_id", track_id)
+    # Per-session state read on every audio flush/interrupt - kept in the
+    # closure rather than going through cl.user_session each time
+    track_id = next_track_id()
+    last_interrupt_log = 0.0
+    
+    # Buffered output audio, flushed as one chunk every AUDIO_FLUSH_SECONDS
+    pcm_buf = bytearray()
+    flush_handle = None
+    # One emit at a time - a flush scheduled while the previous one is still
+    # sending waits its turn, so PCM reaches the browser in order
+    flush_lock = asyncio.Lock()
+    
+    async def flush_audio():
+        """Send the buffered PCM as a single audio chunk"""
+        nonlocal flush_handle
+        flush_handle = None
+        async with flush_lock:
+            if not pcm_buf:
+                return
+            data = bytes(pcm_buf)
+            pcm_buf.clear()
+            try:
+                await cl.context.emitter.send_audio_chunk(
+                    cl.OutputAudioChunk(
+                        mimeType=PCM_MIME,
+                        data=data,
+                        track=track_id,
+                    )
+                )
+            except Exception as send_error:
+                # If send fails, log but don't crash
+                logger.debug("Could not send audio chunk: %s", send_error)
+    
+    def buffer_audio(chunk: bytes):
+        """Append PCM to the buffer and schedule a flush if none is pending"""
+        nonlocal flush_handle
+        if not chunk:
+            return
+        pcm_buf.extend(chunk)
+        if flush_handle is None:
+            flush_handle = asyncio.get_running_loop().call_later(
+                AUDIO_FLUSH_SECONDS, lambda: asyncio.ensure_future(flush_audio())
+            )
+    
+    def drop_buffered_audio():
+        """Discard buffered PCM and any pending flush"""
+        nonlocal flush_handle
+        if flush_handle is not None:
+            flush_handle.cancel()
+            flush_handle = None
+        pcm_buf.clear()
     
     # Set up event handler for conversation updates (audio/text deltas)
     async def on_conv_updated(event):
         """Handle conversation updates - forward audio/text to Chainlit"""
         try:
-            delta = event.get("delta") or {}
+            delta = event.get("delta")
+            if not delta:
+                return
             
-            # Handle audio deltas - send directly to Chainlit audio output
-            if "audio" in delta and delta["audio"]:
-                audio_data = delta["audio"]
+            # Handle audio deltas - buffered and sent to Chainlit audio output
+            audio_data = delta.get("audio")
+            if audio_data:
                 if isinstance(audio_data, bytes):
-                    # Send audio chunk to Chainlit
-                    try:
-                        await cl.context.emitter.send_audio_chunk(
-                            cl.OutputAudioChunk(
-                                mimeType="audio/pcm",
-                                data=audio_data,
-                                track=cl.user_session.get("track_id"),
-                            )
-                        )
-                    except Exception as send_error:
-                        # If send fails, log but don't crash
-                        logger.debug(f"Could not send audio chunk: {send_error}")
+                    buffer_audio(audio_data)
                 elif isinstance(audio_data, list):
                     # Handle list of audio chunks
                     for chunk in audio_data:
                         if isinstance(chunk, bytes):
-                            try:
-                                await cl.context.emitter.send_audio_chunk(
-                                    cl.OutputAudioChunk(
-                                        mimeType="audio/pcm",
-                                        data=chunk,
-                                        track=cl.user_session.get("track_id"),
-                                    )
-                                )
-                            except Exception as send_error:
-                                logger.debug(f"Could not send audio chunk: {send_error}")
+                            buffer_audio(chunk)
                 else:
-                    logger.debug(f"Audio data type: {type(audio_data)}, value: {str(audio_data)[:50]}")
+                    logger.debug("Audio data type: %s, value: %.50s", type(audio_data), audio_data)
             
             # Handle text deltas - optional: show text too
-            if "text" in delta and delta["text"]:
-                text = delta["text"]
-                logger.debug(f"📤 Received text delta: {text[:50]}...")
+            text = delta.get("text")
+            if text:
+                logger.debug("📤 Received text delta: %.50s...", text)
         except Exception as e:
             logger.error(f"Error in conversation.updated handler: {e}", exc_info=True)
     
     # Handle interruptions - reset track ID (but don't log every time to avoid spam)
     async def on_interrupt(_event):
         """Handle conversation interruption"""
+        nonlocal track_id, last_interrupt_log
         # Only log occasionally to avoid spam
-        import time
-        last_interrupt_log = cl.user_session.get("last_interrupt_log", 0)
-        if time.time() - last_interrupt_log > 2.0:  # Log at most once every 2 seconds
+        now = time.time()
+        if now - last_interrupt_log > 2.0:  # Log at most once every 2 seconds
             logger.debug("🔄 Conversation interrupted - resetting track")
-            cl.user_session.set("last_interrupt_log", time.time())
-        cl.user_session.set("track_id", str(uuid4()))
+            last_interrupt_log = now
+        drop_buffered_audio()
+        track_id = next_track_id()
         try:
             await cl.context.emitter.send_audio_interrupt()
         except Exception as e:
-            logger.debug(f"Could not send audio interrupt: {e}")
+            logger.debug("Could not send audio interrupt: %s", e)
     
     # Optional: log all realtime events for debugging
     def on_realtime_event(event):
         """Log realtime events for debugging"""
         event_type = event.get("event", {}).get("type", "unknown")
-        logger.debug(f"🔔 Realtime event: {event_type}")
+        logger.debug("🔔 Realtime event: %s", event_type)
     
     # Register event handlers
     rt.on("conversation.updated", on_conv_updated)
@@ -219,200 +563,109 @@ async def setup_openai_realtime():
     
     # Register tools with RealtimeClient
     # Tool: Query Customer Account
-    async def query_customer_account(account_number: str) -> str:
-        """Query customer account directly from SQLite"""
-        logger.info("=" * 80)
-        logger.info("🔍 API CALL: query_customer_account")
-        logger.info(f"   Account Number: {account_number}")
-        logger.info("=" * 80)
-        try:
-            status_msg = cl.Message(content="🔍 Looking up your account...")
-            await status_msg.send()
-            
-            logger.info(f"📤 Calling get_customer_account({account_number})...")
-            customer = get_customer_account(account_number)
-            
-            if not customer:
-                logger.warning(f"❌ Account not found: {account_number}")
-                status_msg.content = "❌ Account not found. Please check your account number."
-                await status_msg.update()
-                return f"I couldn't find an account with number {account_number}. Please verify your account number and try again."
-            
-            logger.info(f"✅ Account found: {customer.get('customer_name', 'Unknown')}")
-            logger.info(f"   Company: {customer.get('company_name', 'N/A')}")
-            logger.info(f"   Boxes in Storage: {customer.get('boxes_retained', 0)}")
-            logger.info(f"   Boxes Requested: {customer.get('boxes_requested', 0)}")
-            
-            # Format response
-            response = f"""Account Details for {account_number}:
-- Customer Name: {customer['customer_name']}
-- Company: {customer['company_name']}
-- Address: {customer['address']}
-- Phone: {customer['phone_number']}
-- Email: {customer['email']}
-- Boxes in Storage: {customer['boxes_retained']}
-- Boxes Requested: {customer['boxes_requested']}"""
-            
-            # Personalized welcome
-            first_name = customer['customer_name'].split()[0] if customer['customer_name'] else "there"
-            status_msg.content = f"👋 Welcome back, {first_name}!"
-            await status_msg.update()
-            
-            logger.info(f"📥 Returning response: {len(response)} characters")
-            logger.info("=" * 80)
-            return response
-        except Exception as e:
-            logger.error(f"❌ Error querying account: {e}", exc_info=True)
-            return f"I encountered an error while looking up your account. Please try again."
+    query_customer_account = _make_lookup_tool(
+        "query_customer_account",
+        cached_customer,
+        _customer_found,
+        not_found_msg="❌ Account not found. Please check your account number.",
+        not_found_reply="I couldn't find an account with number {account_number}. Please verify your account number and try again.",
+        error_reply="I encountered an error while looking up your account. Please try again.",
+    )
     
     # Tool: Check Box Inventory
-    async def check_box_inventory(account_number: str) -> str:
-        """Check customer's box inventory directly from SQLite"""
-        logger.info("=" * 80)
-        logger.info("📦 API CALL: check_box_inventory")
-        logger.info(f"   Account Number: {account_number}")
-        logger.info("=" * 80)
-        try:
-            status_msg = cl.Message(content="📦 Checking your box inventory...")
-            await status_msg.send()
-            
-            logger.info(f"📤 Calling get_box_inventory({account_number})...")
-            inventory = get_box_inventory(account_number)
-            
-            if not inventory:
-                logger.warning(f"❌ Account not found: {account_number}")
-                status_msg.content = "❌ Account not found."
-                await status_msg.update()
-                return f"I couldn't find an account with number {account_number}."
-            
-            boxes_retained = inventory['boxes_retained']
-            boxes_requested = inventory['boxes_requested']
-            
-            logger.info(f"✅ Inventory retrieved:")
-            logger.info(f"   Customer: {inventory.get('customer_name', 'Unknown')}")
-            logger.info(f"   Boxes in Storage: {boxes_retained}")
-            logger.info(f"   Boxes Requested: {boxes_requested}")
-            
-            status_msg.content = f"✅ Found {boxes_retained} boxes in storage, {boxes_requested} requested"
-            await status_msg.update()
-            
-            if boxes_requested > 0:
-                response = f"Customer {inventory['customer_name']} has {boxes_retained} boxes currently in storage and {boxes_requested} boxes requested for delivery."
-            else:
-                response = f"Customer {inventory['customer_name']} has {boxes_retained} boxes currently in storage with no pending delivery requests."
-            
-            logger.info(f"📥 Returning response: {len(response)} characters")
-            logger.info("=" * 80)
-            return response
-        except Exception as e:
-            logger.error(f"❌ Error checking inventory: {e}", exc_info=True)
-            return f"I encountered an error while checking your inventory. Please try again."
+    check_box_inventory = _make_lookup_tool(
+        "check_box_inventory",
+        cached_inventory,
+        _inventory_found,
+        not_found_msg="❌ Account not found.",
+        not_found_reply="I couldn't find an account with number {account_number}.",
+        error_reply="I encountered an error while checking your inventory. Please try again.",
+    )
     
     # Tool: Request Empty Boxes
     async def request_empty_boxes(account_number: str, quantity: int) -> str:
         """Request empty storage boxes - direct SQLite update"""
-        logger.info("=" * 80)
-        logger.info("📦 API CALL: request_empty_boxes")
-        logger.info(f"   Account Number: {account_number}")
-        logger.info(f"   Quantity: {quantity}")
-        logger.info("=" * 80)
         try:
-            status_msg = cl.Message(content=f"📦 Processing your request for {quantity} boxes...")
-            await status_msg.send()
-            
-            # Get customer details first
-            logger.info(f"📤 Step 1: Calling get_customer_account({account_number})...")
-            customer = get_customer_account(account_number)
-            if not customer:
+            # Update box request and read back the account in one transaction
+            result = await update_box_request_returning(account_number, quantity)
+            if result is None:
+                logger.error(f"❌ Failed to update box request in database")
+                await cl.Message(content="❌ Failed to process request. Please try again.").send()
+                return "I encountered an error while processing your box request. Please try again."
+            if not result["success"]:
                 logger.warning(f"❌ Account not found: {account_number}")
-                status_msg.content = "❌ Account not found."
-                await status_msg.update()
+                await cl.Message(content="❌ Account not found.").send()
                 return f"I couldn't find an account with number {account_number}. Please verify your account number."
             
-            customer_name = customer.get('customer_name', '')
-            address = customer.get('address', '')
-            customer_email = customer.get('email', '')
-            first_name = customer_name.split()[0] if customer_name else "there"
+            await invalidate_account(account_number)
+            # RETURNING always includes these columns; only email is nullable
+            address = result['address']
+            boxes_requested = result['boxes_requested']
             
-            logger.info(f"✅ Customer found: {customer_name}")
-            logger.info(f"   Address: {address}")
-            logger.info(f"   Email: {customer_email}")
+            logger.debug("tool=request_empty_boxes acc=%s qty=%s requested=%s", account_number, quantity, boxes_requested)
             
-            status_msg.content = f"✅ Got your info, {first_name}! Updating your account..."
-            await status_msg.update()
-            
-            # Update database
-            logger.info(f"📤 Step 2: Calling update_box_request({account_number}, {quantity})...")
-            result = update_box_request(account_number, quantity)
-            if not result or not result.get("success"):
-                logger.error(f"❌ Failed to update box request in database")
-                status_msg.content = "❌ Failed to process request. Please try again."
-                await status_msg.update()
-                return "I encountered an error while processing your box request. Please try again."
+            # Send confirmation emails in background (non-blocking)
+            # Queued on Celery when a broker is configured, otherwise sent over the async email pools
+            email_fields = dict(
+                customer_name=result['customer_name'],
+                account_number=account_number,
+                quantity=quantity,
+                address=address,
+            )
+            confirmation_kwargs = dict(
+                email_fields,
+                customer_email=result['email'] or '',  # This will be overridden by TO_EMAIL
+                cancellation_token=result["cancellation_token"],
+            )
+            notification_kwargs = dict(email_fields, internal_email=INTERNAL_NOTIFICATION_EMAIL)
             
-            cancellation_token = result.get("cancellation_token")
-            logger.info(f"✅ Database updated successfully (cancellation token: {cancellation_token[:20]}...)")
+            async def send_confirmation():
+                """Customer confirmation (sent to TO_EMAIL from env)"""
+                job_id = await enqueue_email("box_confirmation", **confirmation_kwargs)
+                if job_id:
+                    logger.debug("Customer confirmation email queued (job %s)", job_id)
+                    return
+                try:
+                    email_sent = await asyncio.wait_for(
+                        send_box_request_confirmation_async(**confirmation_kwargs),
+                        timeout=10.0  # 10 second timeout for email sending
+                    )
+                    
+                    if email_sent:
+                        logger.debug("Customer confirmation email sent")
+                    else:
+                        logger.warning(f"⚠️ Customer confirmation email failed to send")
+                except asyncio.TimeoutError:
+                    logger.warning(f"⚠️ Email sending timed out after 10 seconds")
+                except Exception as email_error:
+                    logger.error(f"❌ Error sending confirmation email: {email_error}")
             
-            # Get updated inventory
-            logger.info(f"📤 Step 3: Calling get_box_inventory({account_number})...")
-            inventory = get_box_inventory(account_number)
-            boxes_requested = inventory['boxes_requested'] if inventory else quantity
-            logger.info(f"✅ Updated boxes_requested: {boxes_requested}")
+            async def send_notification():
+                """Internal notification (optional - only if INTERNAL_NOTIFICATION_EMAIL is set)"""
+                if not INTERNAL_NOTIFICATION_EMAIL:
+                    return
+                job_id = await enqueue_email("box_notification", **notification_kwargs)
+                if job_id:
+                    logger.debug("Internal notification queued (job %s)", job_id)
+                    return
+                try:
+                    internal_sent = await asyncio.wait_for(
+                        send_box_request_notification_async(**notification_kwargs),
+                        timeout=10.0  # 10 second timeout
+                    )
+                    if internal_sent:
+                        logger.debug("Internal notification sent")
+                    else:
+                        logger.warning(f"⚠️ Internal notification failed to send")
+                except asyncio.TimeoutError:
+                    logger.warning(f"⚠️ Internal notification timed out after 10 seconds")
+                except Exception as internal_error:
+                    logger.error(f"❌ Error sending internal notification: {internal_error}")
             
-            # Send confirmation emails in background (non-blocking)
-            # This prevents websocket timeout if email sending is slow
             async def send_emails_background():
-                """Send emails in background without blocking the tool response"""
+                """Send both emails concurrently without blocking the tool response"""
                 try:
-                    logger.info(f"📤 Step 4: Sending confirmation email (background)...")
-                    # Send customer confirmation email with timeout (will be sent to TO_EMAIL from env)
-                    try:
-                        email_sent = await asyncio.wait_for(
-                            asyncio.to_thread(
-                                send_box_request_confirmation,
-                                customer_email=customer_email,  # This will be overridden by TO_EMAIL
-                                customer_name=customer_name,
-                                account_number=account_number,
-                                quantity=quantity,
-                                address=address,
-                                cancellation_token=cancellation_token
-                            ),
-                            timeout=10.0  # 10 second timeout for email sending
-                        )
-                        
-                        if email_sent:
-                            logger.info(f"✅ Customer confirmation email sent successfully")
-                        else:
-                            logger.warning(f"⚠️ Customer confirmation email failed to send")
-                    except asyncio.TimeoutError:
-                        logger.warning(f"⚠️ Email sending timed out after 10 seconds")
-                    except Exception as email_error:
-                        logger.error(f"❌ Error sending confirmation email: {email_error}")
-                    
-                    # Send internal notification (optional - you can set this email)
-                    internal_email = os.getenv("INTERNAL_NOTIFICATION_EMAIL", "")
-                    if internal_email:
-                        try:
-                            logger.info(f"📤 Step 5: Sending internal notification to {internal_email} (background)...")
-                            internal_sent = await asyncio.wait_for(
-                                asyncio.to_thread(
-                                    send_box_request_notification,
-                                    internal_email=internal_email,
-                                    customer_name=customer_name,
-                                    account_number=account_number,
-                                    quantity=quantity,
-                                    address=address
-                                ),
-                                timeout=10.0  # 10 second timeout
-                            )
-                            if internal_sent:
-                                logger.info(f"✅ Internal notification sent successfully")
-                            else:
-                                logger.warning(f"⚠️ Internal notification failed to send")
-                        except asyncio.TimeoutError:
-                            logger.warning(f"⚠️ Internal notification timed out after 10 seconds")
-                        except Exception as internal_error:
-                            logger.error(f"❌ Error sending internal notification: {internal_error}")
+                    await asyncio.gather(send_confirmation(), send_notification())
                 except Exception as e:
                     logger.error(f"❌ Error sending emails in background: {e}", exc_info=True)
             
@@ -420,75 +673,27 @@ async def setup_openai_realtime():
             asyncio.create_task(send_emails_background())
             
             # Update status and return response immediately (don't wait for email)
-            to_email = os.getenv("TO_EMAIL", "your email")
-            status_msg.content = f"✅ Perfect! Your {quantity} boxes will be delivered to {address} in 3-5 business days! Confirmation email will be sent to {to_email}."
-            await status_msg.update()
+            await cl.Message(content=f"✅ Perfect! Your {quantity} boxes will be delivered to {address} in 3-5 business days! Confirmation email will be sent to {TO_EMAIL}.").send()
             
-            response = f"Perfect! Your request for {quantity} boxes has been processed. They'll be delivered to your address in 3-5 business days. Your account now shows {boxes_requested} boxes requested for delivery. A confirmation email will be sent to {to_email}."
+            response = f"Perfect! Your request for {quantity} boxes has been processed. They'll be delivered to your address in 3-5 business days. Your account now shows {boxes_requested} boxes requested for delivery. A confirmation email will be sent to {TO_EMAIL}."
             
-            logger.info(f"📥 Returning response: {len(response)} characters")
-            logger.info("=" * 80)
             return response
         except Exception as e:
             logger.error(f"❌ Error requesting boxes: {e}", exc_info=True)
             return f"Error: {e}"
     
-    # Register tools with RealtimeClient using add_tool()
-    tools_config = [
-        {
-            "name": "query_customer_account",
-            "description": "Look up customer account details by account number. Use this when customer provides their account number or wants to check their account.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "account_number": {
-                        "type": "string",
-                        "description": "Customer account number in format IM-XXXXX"
-                    }
-                },
-                "required": ["account_number"]
-            }
-        },
-        {
-            "name": "check_box_inventory",
-            "description": "Check how many boxes a customer has in storage. Use this when customer asks about their box count or inventory.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "account_number": {
-                        "type": "string",
-                        "description": "Customer account number"
-                    }
-                },
-                "required": ["account_number"]
-            }
-        },
-        {
-            "name": "request_empty_boxes",
-            "description": "Request empty storage boxes for delivery to customer. Use this when customer wants to order boxes. This will update database directly.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "account_number": {
-                        "type": "string",
-                        "description": "Customer account number"
-                    },
-                    "quantity": {
-                        "type": "integer",
-                        "description": "Number of empty boxes to request"
-                    }
-                },
-                "required": ["account_number", "quantity"]
-            }
-        }
-    ]
+    # Tool name -> handler
+    handlers = {
+        "query_customer_account": query_customer_account,
+        "check_box_inventory": check_box_inventory,
+        "request_empty_boxes": request_empty_boxes,
+    }
     
     # Register each tool
-    for tool_def in tools_config:
+    for tool_def in TOOL_DEFINITIONS:
         tool_name = tool_def["name"]
-        handler = locals()[tool_name]  # Get the handler function by name
-        await rt.add_tool(tool_def, handler)
-        logger.info(f"✅ Registered tool: {tool_name}")
+        await rt.add_tool(tool_def, handlers[tool_name])
+        logger.debug("Registered tool: %s", tool_name)
     
     cl.user_session.set("openai_realtime", rt)
     logger.info("✅ OpenAI Realtime client initialized (will configure after connection)")
@@ -501,129 +706,85 @@ async def setup_openai_realtime():
 @cl.on_chat_resume
 async def on_chat_resume(thread: dict):
     """Resume a previous chat thread"""
-    try:
-        await setup_openai_realtime()
-        await cl.Message(content="✅ Welcome back! Continuing your conversation...").send()
-    except Exception as e:
-        logger.error(f"Failed to resume chat: {e}")
-        await cl.ErrorMessage(content="Couldn't resume chat.").send()
+    # The realtime client is created on the first audio start, not here
+    await cl.Message(content="✅ Welcome back! Continuing your conversation...").send()
 
 
 @cl.on_chat_start
 async def start():
     """Initialize Iron Mountain assistant"""
-    await cl.Message(
-        content="👋 **Welcome to Iron Mountain!**\n\n"
-        "I'm **IronAssist**, your virtual storage assistant.\n\n"
-        "I can help you with:\n"
-        "📦 **Check your account** - View your storage details\n"
-        "📊 **Box inventory** - See how many boxes you have with us\n"
-        "🚚 **Request empty boxes** - Order boxes for document storage\n\n"
-        f"{'**🎤 Press `P` to talk, or ' if REALTIME_AVAILABLE else '**'}Type your account number to get started!**\n\n"
-        "_Example: 'My account number is IM-10001'_"
-    ).send()
+    await cl.Message(content=WELCOME_CONTENT).send()
     
-    loading_msg = cl.Message(content="⏳ Connecting to Iron Mountain systems...")
-    await loading_msg.send()
+    # Voice is set up lazily in on_audio_start - most users type, so the
+    # welcome doesn't wait on it
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        logger.warning("⚠️ OPENAI_API_KEY not set - voice features disabled")
+        status = "✅ **Ready!** Text chat is available. (Voice requires OPENAI_API_KEY to be set in Railway environment variables)"
+    elif not REALTIME_AVAILABLE:
+        logger.warning("⚠️ Realtime Client not available - voice features disabled")
+        status = "✅ **Ready!** Text chat is available. (Voice requires realtime module)"
+    else:
+        status = "✅ **Ready!** Voice available — press **P** to talk."
+    await cl.Message(content=status).send()
+
+
+async def _lookup_and_reply(
+    account_number: str,
+    placeholder: str,
+    lookup: Callable[[str], Awaitable[Optional[dict]]],
+    peek: Callable[[str], Optional[dict]],
+    template: str,
+    not_found: str
+):
+    """Send a placeholder, run the lookup alongside it, then replace it with the result"""
+    # Cached row - answer in one message, no placeholder round-trip
+    row = peek(account_number)
+    if row is not None:
+        await cl.Message(content=template.format(acct=account_number, **row)).send()
+        return
     
-    try:
-        # Check if OPENAI_API_KEY is set
-        api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            logger.warning("⚠️ OPENAI_API_KEY not set - voice features disabled")
-            loading_msg.content = "✅ **Ready!** Text chat is available. (Voice requires OPENAI_API_KEY to be set in Railway environment variables)"
-        elif not REALTIME_AVAILABLE:
-            logger.warning("⚠️ Realtime Client not available - voice features disabled")
-            loading_msg.content = "✅ **Ready!** Text chat is available. (Voice requires realtime module)"
-        else:
-            rt = await setup_openai_realtime()
-            if rt:
-                loading_msg.content = "✅ **Ready!** All systems connected. Press **P** to talk!"
-            else:
-                loading_msg.content = "✅ **Ready!** Text chat is available. (Voice initialization failed)"
-        await loading_msg.update()
-    except Exception as e:
-        logger.error(f"Initialization error: {e}", exc_info=True)
-        try:
-            await cl.ErrorMessage(content=f"Setup error: {e}").send()
-        except Exception as send_error:
-            # Fallback if ErrorMessage fails
-            logger.error(f"Failed to send error message: {send_error}")
-            loading_msg.content = f"⚠️ Setup error: {e}"
-            await loading_msg.update()
+    thinking_msg = cl.Message(content=placeholder)
+    _, row = await asyncio.gather(thinking_msg.send(), lookup(account_number))
+    thinking_msg.content = template.format(acct=account_number, **row) if row else not_found
+    await thinking_msg.update()
 
 
 @cl.on_message
 async def on_message(message: cl.Message):
     """Handle text messages - direct SQLite queries"""
-    user_query = message.content.lower()
+    user_query = message.content
+    
+    # Simple keyword-based routing - one scan collects every route hit, then
+    # ROUTE_PRIORITY picks (an account number beats "how many", etc.)
+    hits = {m.lastgroup for m in ROUTER_RE.finditer(user_query)}
+    route = next((r for r in ROUTE_PRIORITY if r in hits), None)
+    account_match = ACCOUNT_RE.search(user_query) if route in ("acct", "inv") else None
     
-    # Simple keyword-based routing
-    if "account" in user_query or "im-" in user_query:
-        # Extract account number if present
-        import re
-        account_match = re.search(r'im-?\d+', user_query, re.IGNORECASE)
+    if route == "acct":
         if account_match:
-            account_number = account_match.group(0).upper().replace('-', '-')
-            if not account_number.startswith('IM-'):
-                account_number = 'IM-' + account_number.split('-')[-1]
-            
-            thinking_msg = cl.Message(content="🔍 Looking up your account...")
-            await thinking_msg.send()
-            
-            customer = get_customer_account(account_number)
-            if customer:
-                response = f"""**Account Details for {account_number}**
-- **Customer:** {customer['customer_name']}
-- **Company:** {customer['company_name']}
-- **Address:** {customer['address']}
-- **Phone:** {customer['phone_number']}
-- **Email:** {customer['email']}
-- **Boxes in Storage:** {customer['boxes_retained']}
-- **Boxes Requested:** {customer['boxes_requested']}"""
-                thinking_msg.content = response
-            else:
-                thinking_msg.content = f"❌ Account {account_number} not found. Please check your account number."
-            await thinking_msg.update()
+            account_number = f"IM-{account_match.group(1)}"
+            await _lookup_and_reply(
+                account_number, "🔍 Looking up your account...", cached_customer, peek_customer, CUSTOMER_TMPL,
+                f"❌ Account {account_number} not found. Please check your account number."
+            )
         return
     
-    elif "inventory" in user_query or ("box" in user_query and ("how many" in user_query or "count" in user_query)):
-        # Extract account number
-        import re
-        account_match = re.search(r'im-?\d+', user_query, re.IGNORECASE)
+    elif route == "inv":
         if account_match:
-            account_number = account_match.group(0).upper().replace('-', '-')
-            if not account_number.startswith('IM-'):
-                account_number = 'IM-' + account_number.split('-')[-1]
-            
-            thinking_msg = cl.Message(content="📦 Checking your box inventory...")
-            await thinking_msg.send()
-            
-            inventory = get_box_inventory(account_number)
-            if inventory:
-                response = f"""**Box Inventory for {account_number}**
-- **Customer:** {inventory['customer_name']}
-- **Boxes in Storage:** {inventory['boxes_retained']}
-- **Boxes Requested:** {inventory['boxes_requested']}"""
-                thinking_msg.content = response
-            else:
-                thinking_msg.content = f"❌ Account {account_number} not found."
-            await thinking_msg.update()
+            account_number = f"IM-{account_match.group(1)}"
+            await _lookup_and_reply(
+                account_number, "📦 Checking your box inventory...", cached_inventory, peek_inventory, INVENTORY_TMPL,
+                f"❌ Account {account_number} not found."
+            )
             return
         
-    elif "request" in user_query or "order" in user_query or "need" in user_query:
-        thinking_msg = cl.Message(content="📦 To request boxes, please provide:\n1. Your account number (e.g., IM-10001)\n2. Number of boxes needed\n\nOr use voice by pressing **P**!")
-        await thinking_msg.send()
+    elif route == "req":
+        await cl.Message(content=REQUEST_BOXES_PROMPT).send()
         return
     
     # Default response
-    await cl.Message(
-        content="I can help you with:\n"
-        "- Checking your account (provide account number like IM-10001)\n"
-        "- Checking box inventory\n"
-        "- Requesting empty boxes\n\n"
-        "**Or press P to use voice!**"
-    ).send()
+    await cl.Message(content=DEFAULT_HELP).send()
 
 
 @cl.on_audio_start
@@ -641,73 +802,111 @@ async def on_audio_start():
             await status_msg.update()
             return False
     
+    if rt.is_connected():
+        # Still connected from an earlier press - no new handshake needed
+        # Fresh queue and sender per recording - nothing left over from a stopped one
+        _start_audio_sender(rt)
+        status_msg.content = "✅ Voice ready! You can now speak."
+        await status_msg.update()
+        return True
+    
     try:
         # Connect to OpenAI Realtime
         await rt.connect()
         logger.info("✅ Connected to OpenAI Realtime")
         
         # Configure session with turn detection and instructions
-        # Allow interruptions but tune VAD to reduce false positives
-        await rt.update_session(
-            turn_detection={
-                "type": "server_vad",
-                "create_response": True,
-                "interrupt_response": True,  # Allow user to interrupt assistant
-                "threshold": 0.5,  # Voice activity threshold (0.0-1.0, higher = less sensitive)
-                "prefix_padding_ms": 300,  # Padding before speech starts
-                "silence_duration_ms": 500,  # Wait longer before considering speech ended (reduces cutting)
-            },
-            modalities=["audio", "text"],
-            input_audio_format="pcm16",
-            output_audio_format="pcm16",
-            voice="echo",
-            temperature=0.6,
-            instructions=(
-                "You are IronAssist, a professional multilingual voice assistant for Iron Mountain, "
-                "the world's leading information management company.\n\n"
-                "ABOUT IRON MOUNTAIN:\n"
-                "- Global leader in storage and information management since 1951\n"
-                "- Trusted by 95% of Fortune 1000 companies\n"
-                "- Services: Document storage, box delivery, secure records management\n\n"
-                "YOUR ROLE:\n"
-                "- Help customers check their account and storage inventory\n"
-                "- Process requests for empty storage boxes\n"
-                "- Provide professional, efficient service\n"
-                "- Support customers in their preferred language\n\n"
-                "CRITICAL WORKFLOW - ACCOUNT VERIFICATION:\n"
-                "When you retrieve customer account information (using query_customer_account tool):\n"
-                "1. ALWAYS welcome the customer by their FIRST NAME (extract from customer_name)\n"
-                "2. ALWAYS confirm their address to ensure it's correct before proceeding\n"
-                "3. Say something like: 'Hi [First Name]! I have your address on file as [address]. Is this still correct?'\n"
-                "4. Wait for confirmation before processing any box requests or deliveries\n"
-                "5. If address is wrong, acknowledge and note that they may need to update it\n"
-                "6. This verification step is MANDATORY for security and accuracy\n\n"
-                "EXAMPLE CONVERSATION:\n"
-                "User: 'My account is IM-10001'\n"
-                "You: [After query_customer_account] 'Hi John! Welcome back to Iron Mountain. I have your address on file as 123 Main St, New York, NY 10001. Is this still the correct delivery address for you?'\n"
-                "User: 'Yes, that's correct'\n"
-                "You: 'Perfect! How can I help you today?'\n\n"
-                "IMPORTANT RULES:\n"
-                "- Always verify account number before providing sensitive information\n"
-                "- ALWAYS welcome customers by first name after retrieving their account\n"
-                "- ALWAYS confirm address before processing any delivery requests\n"
-                "- Be clear about delivery timeframes (3-5 business days)\n"
-                "- Stay professional but friendly\n"
-                "- Keep the conversation flowing naturally during all operations\n"
-            ),
-        )
+        await rt.update_session(**VOICE_SESSION_CONFIG)
         
         logger.info("✅ Session configured")
+        _start_audio_sender(rt)
         status_msg.content = "✅ Voice ready! You can now speak."
         await status_msg.update()
         return True
     except Exception as e:
         logger.error(f"Failed to connect to voice service: {e}", exc_info=True)
+        # No connection - don't leave a sender from an earlier recording queueing audio
+        _stop_audio_sender()
         status_msg.content = f"⚠️ Failed to connect: {str(e)}"
         await status_msg.update()
         return False
 
 
+def _log_audio_error(error: Exception):
+    """Count an input audio failure and log a summary at most every AUDIO_ERROR_LOG_INTERVAL"""
+    global _audio_err_count, _audio_last_log
+    _audio_err_count += 1
+    now = time.monotonic()
+    if now - _audio_last_log > AUDIO_ERROR_LOG_INTERVAL:
+        logger.warning(f"⚠️ Error appending audio ({_audio_err_count} failed chunks since last report): {error}")
+        _audio_err_count = 0
+        _audio_last_log = now
+
+
+async def _flush_input_audio(rt: RealtimeClient, audio_in: bytearray):
+    """Send the batched input audio as one append and empty the buffer"""
+    if not audio_in:
+        return
+    data = bytes(audio_in)
+    audio_in.clear()
+    try:
+        await rt.append_input_audio(data)
+    except Exception as e:
+        _log_audio_error(e)
+
+
+async def _audio_sender(q: asyncio.Queue, rt: RealtimeClient):
+    """Forward queued input audio in AUDIO_INPUT_BATCH_BYTES batches (None flushes early)"""
+    audio_in = bytearray()
+    while True:
+        data = await q.get()
+        try:
+            if data is not None:
+                audio_in.extend(data)
+            if data is None or len(audio_in) >= AUDIO_INPUT_BATCH_BYTES:
+                await _flush_input_audio(rt, audio_in)
+        finally:
+            q.task_done()
+
+
+def _enqueue_audio(q: asyncio.Queue, data: bytes):
+    """Queue without waiting - if the sender has fallen behind, drop the oldest chunk"""
+    try:
+        q.put_nowait(data)
+    except asyncio.QueueFull:
+        oldest = q.get_nowait()
+        q.task_done()
+        if oldest is None:
+            # Never drop a flush sentinel - requeue it and drop this chunk instead
+            q.put_nowait(None)
+            return
+        q.put_nowait(data)
+
+
+async def _drain_input_audio(q: asyncio.Queue):
+    """Queue a flush behind everything already queued and wait until it's sent"""
+    # Waits for room rather than evicting, so no audio ahead of the flush is lost
+    await q.put(None)
+    await q.join()
+
+
+def _start_audio_sender(rt: RealtimeClient):
+    """Create this session's input audio queue and the task that drains it"""
+    _stop_audio_sender()
+    q = asyncio.Queue(maxsize=AUDIO_INPUT_QUEUE_SIZE)
+    cl.user_session.set("audio_in_queue", q)
+    cl.user_session.set("audio_sender", asyncio.create_task(_audio_sender(q, rt)))
+
+
+def _stop_audio_sender():
+    """Cancel this session's input audio sender, if any"""
+    sender: Optional[asyncio.Task] = cl.user_session.get("audio_sender")
+    if sender:
+        sender.cancel()
+    cl.user_session.set("audio_sender", None)
+    cl.user_session.set("audio_in_queue", None)
+
+
 @cl.on_audio_chunk
 async def on_audio_chunk(chunk: cl.InputAudioChunk):
     """Stream audio to OpenAI Realtime"""
@@ -718,10 +917,11 @@ async def on_audio_chunk(chunk: cl.InputAudioChunk):
     if not rt or not rt.is_connected():
         return
     
-    try:
-        await rt.append_input_audio(chunk.data)
-    except Exception as e:
-        logger.debug(f"Error appending audio: {e}")
+    # The sender task does the (possibly slow) websocket send, so receiving
+    # the next browser chunk never waits on OpenAI
+    q: asyncio.Queue = cl.user_session.get("audio_in_queue")
+    if q is not None:
+        _enqueue_audio(q, chunk.data)
 
 
 @cl.on_audio_end
@@ -729,10 +929,17 @@ async def on_audio_end():
     """Handle end of audio input - create response"""
     rt: RealtimeClient = cl.user_session.get("openai_realtime")
     if rt and rt.is_connected():
+        # Send the tail of the recording that didn't fill a batch
+        q: asyncio.Queue = cl.user_session.get("audio_in_queue")
+        if q is not None:
+            try:
+                await asyncio.wait_for(_drain_input_audio(q), AUDIO_END_DRAIN_SECONDS)
+            except asyncio.TimeoutError:
+                logger.warning("⚠️ Input audio still queued at audio end - creating response anyway")
         try:
             # Force response creation (even if server_vad create_response is true, this is harmless)
             await rt.create_response()
-            logger.info("✅ Audio ended → response.create sent")
+            logger.debug("Audio ended → response.create sent")
         except Exception as e:
             logger.error(f"Error creating response: {e}", exc_info=True)
 
@@ -741,6 +948,7 @@ async def on_audio_end():
 @cl.on_stop
 async def on_end():
     """Cleanup"""
+    _stop_audio_sender()
     rt: RealtimeClient = cl.user_session.get("openai_realtime")
     if rt and rt.is_connected():
         try:
@@ -0,0 +1,34 @@
+"""
+ASGI entry point for running the Chainlit app under uvicorn directly
+
+`chainlit run` always starts a single uvicorn server with default settings
+(asyncio loop, h11 parser, access log on). This module does the same loading
+Chainlit's CLI does, so production can pick its own uvicorn options:
+
+    uvicorn asgi:app --host 0.0.0.0 --port $PORT \
+        --loop uvloop --http httptools --no-access-log \
+        --workers ${WEB_CONCURRENCY:-1}
+
+Chainlit keeps user sessions in process memory, so only raise WEB_CONCURRENCY
+above 1 behind a load balancer with sticky sessions. The SQLite database runs
+in WAL mode (db/async_pool.py), so workers don't serialize readers on the file.
+"""
+import os
+from pathlib import Path
+from chainlit.auth import ensure_jwt_secret
+from chainlit.config import config, load_module
+
+APP_FILE = str(Path(__file__).parent / "app.py")
+
+config.run.host = os.getenv("CHAINLIT_HOST", "0.0.0.0")
+config.run.port = int(os.getenv("PORT", os.getenv("CHAINLIT_PORT", "8000")))
+config.run.root_path = os.getenv("CHAINLIT_ROOT_PATH", "")
+
+from chainlit.server import app
+
+# Load app.py - registers Chainlit callbacks, REST routes and the lifespan
+config.run.module_name = APP_FILE
+load_module(config.run.module_name)
+ensure_jwt_secret()
+
+__all__ = ["app"]
@@ -1,16 +1,22 @@
 """
 Database layer for Iron Mountain
 """
-from db.connection import get_db_connection
+from db.async_pool import get_pool, init_pool, close_pool
 from db.queries import (
     get_customer_account,
     get_box_inventory,
-    update_box_request
+    update_box_request_returning,
+    get_pending_box_request,
+    cancel_box_request
 )
 
 __all__ = [
-    'get_db_connection',
+    'get_pool',
+    'init_pool',
+    'close_pool',
     'get_customer_account',
     'get_box_inventory',
-    'update_box_request',
+    'update_box_request_returning',
+    'get_pending_box_request',
+    'cancel_box_request',
 ]
@@ -0,0 +1,71 @@
+"""
+Async SQLite connection pool (aiosqlite + aiosqlitepool)
+"""
+import os
+import asyncio
+from typing import Optional
+import aiosqlite
+from aiosqlitepool import SQLiteConnectionPool
+from chainlit.logger import logger
+from db.connection import resolve_db_path, ensure_db_initialized
+
+# Applied once per new connection so every pooled handle inherits them
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-65536",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+)
+
+# Connections kept by the pool; all of them are opened at startup
+POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "5"))
+
+_pool: Optional[SQLiteConnectionPool] = None
+
+
+async def _connection_factory() -> aiosqlite.Connection:
+    """Open a new aiosqlite connection with row access by column name"""
+    db_path = resolve_db_path()
+    ensure_db_initialized(db_path)
+
+    conn = await aiosqlite.connect(db_path)
+    conn.row_factory = aiosqlite.Row
+    for pragma in CONNECTION_PRAGMAS:
+        await conn.execute(pragma)
+    return conn
+
+
+def get_pool() -> SQLiteConnectionPool:
+    """Get the process-wide connection pool, creating it on first use"""
+    global _pool
+
+    if _pool is None:
+        _pool = SQLiteConnectionPool(connection_factory=_connection_factory, pool_size=POOL_SIZE)
+    return _pool
+
+
+async def _warm_connection(pool: SQLiteConnectionPool, all_open: asyncio.Barrier):
+    """Open one pooled connection and hold it until every warm-up task has one"""
+    async with pool.connection() as conn:
+        await conn.execute("SELECT 1")
+        await all_open.wait()
+
+
+async def init_pool() -> SQLiteConnectionPool:
+    """Create the connection pool and open all its connections (called from the FastAPI lifespan startup)"""
+    pool = get_pool()
+    all_open = asyncio.Barrier(POOL_SIZE)
+    await asyncio.gather(*(_warm_connection(pool, all_open) for _ in range(POOL_SIZE)))
+    logger.info(f"✅ SQLite connection pool ready ({POOL_SIZE} connections)")
+    return pool
+
+
+async def close_pool():
+    """Close all pooled connections (called from the FastAPI lifespan shutdown)"""
+    global _pool
+
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+        logger.info("SQLite connection pool closed")
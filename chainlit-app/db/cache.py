@@ -0,0 +1,218 @@
+"""
+Cache for customer account and inventory lookups
+
+In-process TTL LRU (L1) in front of Redis (L2, optional) in front of SQLite
+"""
+import os
+import json
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Optional, Dict, Callable, Awaitable
+from chainlit.logger import logger
+from db.queries import get_customer_account, get_box_inventory
+
+# Try to import Redis
+try:
+    import redis.asyncio as aioredis
+    REDIS_AVAILABLE = True
+except ImportError:
+    aioredis = None
+    REDIS_AVAILABLE = False
+    logger.warning("Redis not available. Install with: pip install redis")
+
+# Cache disabled unless REDIS_URL is set (queries go straight to SQLite)
+REDIS_URL = os.getenv("REDIS_URL", "")
+
+CUSTOMER_TTL = 300  # seconds
+INVENTORY_TTL = 30  # seconds
+
+# L1 is per process, so other workers may serve a changed row for up to LOCAL_CACHE_TTL
+LOCAL_CACHE_MAX = 256
+LOCAL_CACHE_TTL = 30  # seconds
+
+# Single-flight on a Redis miss: one caller holds lock:<key> and loads from
+# SQLite, the rest poll for the value until it appears or the lock goes away
+LOAD_LOCK_TTL = 5  # seconds
+LOAD_LOCK_POLL = 0.05  # seconds
+
+_redis = None
+_local: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, row)
+
+
+def customer_key(account_number: str) -> str:
+    return f"im:cust:{account_number}"
+
+
+def inventory_key(account_number: str) -> str:
+    return f"im:inv:{account_number}"
+
+
+def get_redis():
+    """Get the shared Redis client, or None if caching is disabled"""
+    global _redis
+
+    if _redis is None and REDIS_AVAILABLE and REDIS_URL:
+        _redis = aioredis.from_url(REDIS_URL, decode_responses=True)
+    return _redis
+
+
+def _local_get(key: str) -> Optional[Dict]:
+    """Return a fresh L1 entry and mark it most recently used"""
+    entry = _local.get(key)
+    if entry is None:
+        return None
+    expires_at, value = entry
+    if expires_at < time.monotonic():
+        del _local[key]
+        return None
+    _local.move_to_end(key)
+    return value
+
+
+def _local_set(key: str, value: Dict, ttl: int):
+    """Store an L1 entry, evicting the least recently used one when full"""
+    _local[key] = (time.monotonic() + min(ttl, LOCAL_CACHE_TTL), value)
+    _local.move_to_end(key)
+    if len(_local) > LOCAL_CACHE_MAX:
+        _local.popitem(last=False)
+
+
+async def init_redis():
+    """Connect the shared Redis client (called from the FastAPI lifespan startup)"""
+    client = get_redis()
+    if client is None:
+        return None
+
+    try:
+        await client.ping()
+        logger.info("✅ Redis cache connected")
+    except Exception as e:
+        logger.warning(f"⚠️ Redis not reachable, lookups will fall back to SQLite: {e}")
+    return client
+
+
+async def close_redis():
+    """Close the shared Redis client"""
+    global _redis
+
+    if _redis is not None:
+        await _redis.close()
+        _redis = None
+
+
+async def _cached(
+    key: str,
+    ttl: int,
+    loader: Callable[[str], Awaitable[Optional[Dict]]],
+    account_number: str
+) -> Optional[Dict]:
+    """Return the cached row for key, loading and caching it on a miss"""
+    value = _local_get(key)
+    if value is not None:
+        return value
+
+    value = await _redis_cached(key, ttl, loader, account_number)
+    if value is not None:
+        _local_set(key, value, ttl)
+    return value
+
+
+async def _redis_cached(
+    key: str,
+    ttl: int,
+    loader: Callable[[str], Awaitable[Optional[Dict]]],
+    account_number: str
+) -> Optional[Dict]:
+    """L2: read through Redis when configured, otherwise go straight to the loader"""
+    client = get_redis()
+    if client is None:
+        return await loader(account_number)
+
+    try:
+        cached = await client.get(key)
+        if cached is not None:
+            return json.loads(cached)
+    except Exception as e:
+        logger.warning(f"Redis read failed for {key}: {e}")
+        return await loader(account_number)
+
+    lock_key = f"lock:{key}"
+    try:
+        locked = await client.set(lock_key, "1", nx=True, ex=LOAD_LOCK_TTL)
+    except Exception as e:
+        logger.warning(f"Redis lock failed for {key}: {e}")
+        return await loader(account_number)
+
+    if not locked:
+        value = await _wait_for_load(client, key, lock_key)
+        if value is not None:
+            return value
+        # The loader found nothing or gave up - load ourselves
+        return await loader(account_number)
+
+    try:
+        value = await loader(account_number)
+        if value is not None:
+            try:
+                await client.set(key, json.dumps(value), ex=ttl)
+            except Exception as e:
+                logger.warning(f"Redis write failed for {key}: {e}")
+        return value
+    finally:
+        try:
+            await client.delete(lock_key)
+        except Exception:
+            pass  # expires after LOAD_LOCK_TTL anyway
+
+
+async def _wait_for_load(client, key: str, lock_key: str) -> Optional[Dict]:
+    """Poll for the value another caller is loading; None once its lock is released without one"""
+    deadline = time.monotonic() + LOAD_LOCK_TTL
+    while time.monotonic() < deadline:
+        await asyncio.sleep(LOAD_LOCK_POLL)
+        try:
+            cached, lock = await client.mget(key, lock_key)
+        except Exception as e:
+            logger.warning(f"Redis read failed for {key}: {e}")
+            return None
+        if cached is not None:
+            return json.loads(cached)
+        if lock is None:
+            return None
+    return None
+
+
+async def cached_customer(account_number: str) -> Optional[Dict]:
+    """Get customer account details, served from cache when possible"""
+    return await _cached(customer_key(account_number), CUSTOMER_TTL, get_customer_account, account_number)
+
+
+async def cached_inventory(account_number: str) -> Optional[Dict]:
+    """Get customer's box inventory, served from cache when possible"""
+    return await _cached(inventory_key(account_number), INVENTORY_TTL, get_box_inventory, account_number)
+
+
+def peek_customer(account_number: str) -> Optional[Dict]:
+    """Return customer details only if they are in the in-process cache (no I/O)"""
+    return _local_get(customer_key(account_number))
+
+
+def peek_inventory(account_number: str) -> Optional[Dict]:
+    """Return box inventory only if it is in the in-process cache (no I/O)"""
+    return _local_get(inventory_key(account_number))
+
+
+async def invalidate_account(account_number: str):
+    """Drop cached entries for an account after its data changes"""
+    _local.pop(customer_key(account_number), None)
+    _local.pop(inventory_key(account_number), None)
+
+    client = get_redis()
+    if client is None:
+        return
+
+    try:
+        await client.delete(customer_key(account_number), inventory_key(account_number))
+    except Exception as e:
+        logger.warning(f"Redis invalidation failed for {account_number}: {e}")
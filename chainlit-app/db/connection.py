@@ -2,10 +2,9 @@
 Database connection utilities
 """
 import os
+from functools import lru_cache
 from pathlib import Path
 from dotenv import load_dotenv
-import sqlite3
-from chainlit.logger import logger
 
 # Load environment variables from .env file
 env_path = Path(__file__).parent.parent.parent / '.env'
@@ -19,44 +18,39 @@ SQLITE_DB_PATH = os.getenv("SQLITE_DB_PATH", "/tmp/database/ironmountain.db")
 _db_initialized = False
 
 
-def get_db_connection():
-    """Get SQLite connection to ironmountain database"""
-    global _db_initialized
+@lru_cache(maxsize=None)
+def resolve_db_path() -> str:
+    """Resolve the configured SQLite path and make sure its directory exists (once per process)"""
+    # Use the configured path
+    db_path = SQLITE_DB_PATH
     
-    try:
-        # Use the configured path
-        db_path = SQLITE_DB_PATH
-        
-        # If relative path, try to resolve it
-        if not os.path.isabs(db_path):
-            possible_paths = [
-                os.path.abspath(os.path.join(os.path.dirname(__file__), "..", db_path)),
-                os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "database", "ironmountain.db")),
-                os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", "database", "ironmountain.db")),
-            ]
-            
-            for path in possible_paths:
-                if os.path.exists(path):
-                    db_path = path
-                    break
-            else:
-                # Use first path if none exist
-                db_path = possible_paths[0]
-        
-        # Ensure directory exists
-        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    # If relative path, try to resolve it
+    if not os.path.isabs(db_path):
+        possible_paths = [
+            os.path.abspath(os.path.join(os.path.dirname(__file__), "..", db_path)),
+            os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "database", "ironmountain.db")),
+            os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", "database", "ironmountain.db")),
+        ]
         
-        # Connect to database
-        conn = sqlite3.connect(db_path)
-        conn.row_factory = sqlite3.Row
-        
-        # Initialize database if not already done
-        if not _db_initialized:
-            from db.init_db import init_database
-            init_database(db_path)
-            _db_initialized = True
-        
-        return conn
-    except Exception as e:
-        logger.error(f"Database connection error: {e}")
-        return None
+        for path in possible_paths:
+            if os.path.exists(path):
+                db_path = path
+                break
+        else:
+            # Use first path if none exist
+            db_path = possible_paths[0]
+    
+    # Ensure directory exists
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    return db_path
+
+
+def ensure_db_initialized(db_path: str):
+    """Create schema and sample data once per process"""
+    global _db_initialized
+    
+    if not _db_initialized:
+        from db.init_db import init_database
+        init_database(db_path)
+        _db_initialized = True
+
@@ -3,119 +3,185 @@ Database query functions for Iron Mountain
 """
 import secrets
 from typing import Optional, Dict
-from datetime import datetime
 from chainlit.logger import logger
-from db.connection import get_db_connection
+from db.async_pool import get_pool
 
+# Hot lookups - kept as constants so every call hits sqlite3's per-connection
+# prepared statement cache with the same SQL text
+CUSTOMER_ACCOUNT_SQL = """
+    SELECT
+        account_number,
+        customer_name,
+        company_name,
+        address,
+        phone_number,
+        email,
+        boxes_retained,
+        boxes_requested,
+        last_request_date,
+        created_at
+    FROM ironmountain_customers
+    WHERE account_number = ?
+"""
+
+BOX_INVENTORY_SQL = """
+    SELECT
+        account_number,
+        customer_name,
+        boxes_retained,
+        boxes_requested
+    FROM ironmountain_customers
+    WHERE account_number = ?
+"""
 
-def get_customer_account(account_number: str) -> Optional[Dict]:
+
+async def get_customer_account(account_number: str) -> Optional[Dict]:
     """Get customer account details by account number"""
-    conn = get_db_connection()
-    if not conn:
-        return None
-    
     try:
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            SELECT 
-                account_number,
-                customer_name,
-                company_name,
-                address,
-                phone_number,
-                email,
-                boxes_retained,
-                boxes_requested,
-                last_request_date,
-                created_at
-            FROM ironmountain_customers
-            WHERE account_number = ?
-            """,
-            (account_number,)
-        )
-        row = cursor.fetchone()
-        cursor.close()
-        conn.close()
-        
-        if row:
-            return dict(row)
+        async with get_pool().connection() as conn:
+            rows = await conn.execute_fetchall(CUSTOMER_ACCOUNT_SQL, (account_number,))
+
+        if rows:
+            return dict(rows[0])
         return None
     except Exception as e:
         logger.error(f"Error getting customer account: {e}")
-        conn.close()
         return None
 
 
-def get_box_inventory(account_number: str) -> Optional[Dict]:
+async def get_box_inventory(account_number: str) -> Optional[Dict]:
     """Get customer's box inventory"""
-    conn = get_db_connection()
-    if not conn:
-        return None
-    
     try:
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            SELECT 
-                account_number,
-                customer_name,
-                boxes_retained,
-                boxes_requested
-            FROM ironmountain_customers
-            WHERE account_number = ?
-            """,
-            (account_number,)
-        )
-        row = cursor.fetchone()
-        cursor.close()
-        conn.close()
-        
-        if row:
-            return dict(row)
+        async with get_pool().connection() as conn:
+            rows = await conn.execute_fetchall(BOX_INVENTORY_SQL, (account_number,))
+
+        if rows:
+            return dict(rows[0])
         return None
     except Exception as e:
         logger.error(f"Error getting box inventory: {e}")
-        conn.close()
         return None
 
 
-def update_box_request(account_number: str, quantity: int) -> Optional[Dict]:
-    """Update customer's box request (add to boxes_requested) and return cancellation token"""
-    conn = get_db_connection()
-    if not conn:
-        return None
+async def update_box_request_returning(account_number: str, quantity: int) -> Optional[Dict]:
+    """
+    Add to boxes_requested and record the box request in a single transaction
     
+    Returns:
+        {"success": True, "cancellation_token": ..., <updated customer fields>},
+        {"success": False, "message": "Customer not found"} if the account doesn't exist,
+        or None on database error
+    """
     try:
-        cursor = conn.cursor()
-        
-        # Update boxes_requested
-        cursor.execute(
-            """
-            UPDATE ironmountain_customers
-            SET boxes_requested = boxes_requested + ?,
-                last_request_date = ?
-            WHERE account_number = ?
-            """,
-            (quantity, datetime.now().isoformat(), account_number)
-        )
-        
-        # Create box request record with cancellation token
-        cancellation_token = secrets.token_urlsafe(32)
-        cursor.execute(
-            """
-            INSERT INTO box_requests (account_number, quantity, cancellation_token, status)
-            VALUES (?, ?, ?, 'pending')
-            """,
-            (account_number, quantity, cancellation_token)
-        )
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
-        return {"success": True, "cancellation_token": cancellation_token}
+        async with get_pool().connection() as conn:
+            try:
+                rows = await conn.execute_fetchall(
+                    """
+                    UPDATE ironmountain_customers
+                    SET boxes_requested = boxes_requested + ?,
+                        last_request_date = CURRENT_TIMESTAMP
+                    WHERE account_number = ?
+                    RETURNING
+                        account_number,
+                        customer_name,
+                        address,
+                        email,
+                        boxes_retained,
+                        boxes_requested
+                    """,
+                    (quantity, account_number)
+                )
+                if not rows:
+                    await conn.rollback()
+                    return {"success": False, "message": "Customer not found"}
+
+                # Create box request record with cancellation token
+                cancellation_token = secrets.token_urlsafe(32)
+                await conn.execute(
+                    """
+                    INSERT INTO box_requests (account_number, quantity, cancellation_token, status)
+                    VALUES (?, ?, ?, 'pending')
+                    """,
+                    (account_number, quantity, cancellation_token)
+                )
+
+                await conn.commit()
+            except Exception:
+                await conn.rollback()
+                raise
+        return {"success": True, "cancellation_token": cancellation_token, **dict(rows[0])}
     except Exception as e:
         logger.error(f"Error updating box request: {e}")
-        conn.rollback()
-        conn.close()
         return None
+
+
+async def get_pending_box_request(cancellation_token: str) -> Optional[Dict]:
+    """
+    Get a pending box request with its customer by cancellation token
+    
+    Returns None if there is no pending request for the token. Database errors
+    propagate so the cancellation page can show an error instead of "not found".
+    """
+    async with get_pool().connection() as conn:
+        rows = await conn.execute_fetchall(
+            """
+            SELECT 
+                br.*,
+                c.customer_name,
+                c.company_name,
+                c.account_number
+            FROM box_requests br
+            JOIN ironmountain_customers c ON br.account_number = c.account_number
+            WHERE br.cancellation_token = ? 
+            AND br.status = 'pending'
+            AND br.cancelled_at IS NULL
+            """,
+            (cancellation_token,)
+        )
+    return dict(rows[0]) if rows else None
+
+
+async def cancel_box_request(cancellation_token: str) -> Optional[Dict]:
+    """
+    Cancel a pending box request and take its boxes off the customer's count
+    
+    Returns the cancelled request, or None if there was no pending request for
+    the token. Database errors propagate (after rollback).
+    """
+    async with get_pool().connection() as conn:
+        try:
+            # Claim the request and mark it cancelled in one statement - the
+            # status/cancelled_at guard means a second concurrent cancel
+            # updates nothing instead of decrementing the count twice
+            rows = await conn.execute_fetchall(
+                """
+                UPDATE box_requests 
+                SET status = 'cancelled',
+                    cancelled_at = CURRENT_TIMESTAMP
+                WHERE cancellation_token = ? 
+                AND status = 'pending'
+                AND cancelled_at IS NULL
+                RETURNING *
+                """,
+                (cancellation_token,)
+            )
+            if not rows:
+                await conn.rollback()
+                return None
+            request_data = dict(rows[0])
+
+            # Update customer's boxes_requested count
+            await conn.execute(
+                """
+                UPDATE ironmountain_customers
+                SET boxes_requested = boxes_requested - ?
+                WHERE account_number = ?
+                """,
+                (request_data['quantity'], request_data['account_number'])
+            )
+
+            await conn.commit()
+        except Exception:
+            await conn.rollback()
+            raise
+    return request_data
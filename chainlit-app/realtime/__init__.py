@@ -4,13 +4,14 @@ import os
 from pathlib import Path
 from dotenv import load_dotenv
 import asyncio
+import logging
 
 # Load environment variables from .env file
 env_path = Path(__file__).parent.parent.parent / '.env'
 load_dotenv(env_path)
 import inspect
 import numpy as np
-import json
+import orjson
 import websockets
 from datetime import datetime
 from collections import defaultdict
@@ -93,10 +94,15 @@ class RealtimeAPI(RealtimeEventHandler):
         self.ws = None
 
     def is_connected(self):
-        return self.ws is not None
+        # A socket the server closed (idle timeout, network drop) counts as
+        # disconnected so callers reconnect instead of sending into it
+        return self.ws is not None and self.ws.open
 
     def log(self, *args):
-        logger.debug(f"[Websocket/{datetime.utcnow().isoformat()}]", *args)
+        # Called for every websocket frame - skip the timestamp and the event
+        # repr entirely unless debug logging is on
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[Websocket/%s] %s", datetime.utcnow().isoformat(), " ".join(map(str, args)))
 
     async def connect(self, model='gpt-4o-realtime-preview-2024-12-17'):
         if self.is_connected():
@@ -118,9 +124,9 @@ class RealtimeAPI(RealtimeEventHandler):
 
     async def _receive_messages(self):
         async for message in self.ws:
-            event = json.loads(message)
+            event = orjson.loads(message)
             if event["type"] == "error":
-                logger.error("ERROR", event)
+                logger.error("ERROR %s", event)
             self.log("received:", event)
             self.dispatch(f"server.{event['type']}", event)
             self.dispatch("server.*", event)
@@ -135,15 +141,16 @@ class RealtimeAPI(RealtimeEventHandler):
         self.dispatch(f"client.{event_name}", event)
         self.dispatch("client.*", event)
         self.log("sent:", event)
-        await self.ws.send(json.dumps(event))
+        # Decoded so the event still goes out as a text frame
+        await self.ws.send(orjson.dumps(event).decode())
 
     def _generate_id(self, prefix):
         return f"{prefix}{int(datetime.utcnow().timestamp() * 1000)}"
 
     async def disconnect(self):
         if self.ws:
-            await self.ws.close()
-            self.ws = None
+            ws, self.ws = self.ws, None
+            await ws.close()
             self.log(f"Disconnected from {self.url}")
 
 
@@ -360,11 +367,12 @@ class RealtimeConversation:
         delta = event["delta"]
         item = self.item_lookup.get(item_id)
         if not item:
-            logger.debug(f'response.audio.delta: Item "{item_id}" not found')
+            logger.debug('response.audio.delta: Item "%s" not found', item_id)
             return None, None
-        array_buffer = base64_to_array_buffer(delta)
-        append_values = array_buffer.tobytes()
-        item["formatted"]["audio"] += [append_values]
+        # Straight to bytes - a numpy view only to copy it back out costs an
+        # extra allocation on every audio frame
+        append_values = base64.b64decode(delta)
+        item["formatted"]["audio"].append(append_values)
         return item, {"audio": append_values}
 
     def _process_text_delta(self, event):
@@ -391,22 +399,42 @@ class RealtimeConversation:
         return item, {"arguments": delta}
 
 
+# Session defaults shared by every client - built once at import. Apps
+# normally override the instructions through update_session().
+DEFAULT_INSTRUCTIONS = (
+    "System settings:\nTool use: enabled.\n\n"
+    "Instructions:\n"
+    "- You are an artificial intelligence agent responsible for helping test realtime voice capabilities\n"
+    "- Please make sure to respond with a helpful voice via audio\n"
+    "- Be kind, helpful, and curteous\n"
+    "- It is okay to ask the user questions\n"
+    "- Use tools and functions you have available liberally, it is part of the training apparatus\n"
+    "- Be open to exploration and conversation\n"
+    "- Remember: this is just for fun and testing!\n\n"
+    "Personality:\n"
+    "- Be upbeat and genuine\n"
+    "- Try speaking quickly as if excited\n"
+)
+
+DEFAULT_SESSION_CONFIG = {
+    "modalities": ["text", "audio"],
+    "instructions": DEFAULT_INSTRUCTIONS,
+    "voice": "shimmer",
+    "input_audio_format": "pcm16",
+    "output_audio_format": "pcm16",
+    "input_audio_transcription": {"model": "whisper-1"},
+    "turn_detection": {"type": "server_vad"},
+    "tools": [],
+    "tool_choice": "auto",
+    "temperature": 0.8,
+    "max_response_output_tokens": 4096,
+}
+
+
 class RealtimeClient(RealtimeEventHandler):
     def __init__(self, url=None, api_key=None):
         super().__init__()
-        self.default_session_config = {
-            "modalities": ["text", "audio"],
-            "instructions": "System settings:\nTool use: enabled.\n\nInstructions:\n- You are an artificial intelligence agent responsible for helping test realtime voice capabilities\n- Please make sure to respond with a helpful voice via audio\n- Be kind, helpful, and curteous\n- It is okay to ask the user questions\n- Use tools and functions you have available liberally, it is part of the training apparatus\n- Be open to exploration and conversation\n- Remember: this is just for fun and testing!\n\nPersonality:\n- Be upbeat and genuine\n- Try speaking quickly as if excited\n",
-            "voice": "shimmer",
-            "input_audio_format": "pcm16",
-            "output_audio_format": "pcm16",
-            "input_audio_transcription": {"model": "whisper-1"},
-            "turn_detection": {"type": "server_vad"},
-            "tools": [],
-            "tool_choice": "auto",
-            "temperature": 0.8,
-            "max_response_output_tokens": 4096,
-        }
+        self.default_session_config = DEFAULT_SESSION_CONFIG
         self.session_config = {}
         self.transcription_models = [{"model": "whisper-1"}]
         self.default_server_vad_config = {
@@ -417,11 +445,13 @@ class RealtimeClient(RealtimeEventHandler):
         }
         self.realtime = RealtimeAPI(url, api_key)
         self.conversation = RealtimeConversation()
+        self._session_created_event = asyncio.Event()
         self._reset_config()
         self._add_api_event_handlers()
 
     def _reset_config(self):
         self.session_created = False
+        self._session_created_event.clear()
         self.tools = {}
         self.session_config = self.default_session_config.copy()
         self.input_audio_buffer = bytearray()
@@ -465,6 +495,7 @@ class RealtimeClient(RealtimeEventHandler):
 
     def _on_session_created(self, event):
         self.session_created = True
+        self._session_created_event.set()
 
     def _process_event(self, event, *args):
         item, delta = self.conversation.process_event(event, *args)
@@ -494,7 +525,7 @@ class RealtimeClient(RealtimeEventHandler):
 
     async def _call_tool(self, tool):
         try:
-            json_arguments = json.loads(tool["arguments"])
+            json_arguments = orjson.loads(tool["arguments"])
             tool_config = self.tools.get(tool["name"])
             if not tool_config:
                 raise Exception(f'Tool "{tool["name"]}" has not been added')
@@ -512,7 +543,7 @@ class RealtimeClient(RealtimeEventHandler):
                         "item": {
                             "type": "function_call_output",
                             "call_id": tool["call_id"],
-                            "output": json.dumps(result),
+                            "output": orjson.dumps(result).decode(),
                         }
                     },
                 )
@@ -521,7 +552,7 @@ class RealtimeClient(RealtimeEventHandler):
                 # Try to reconnect or handle gracefully
                 return
         except Exception as e:
-            logger.error(f"Tool call error: {json.dumps({'error': str(e)})}")
+            logger.error(f"Tool call error: {e}")
             
             # Check connection before sending error
             if not self.is_connected():
@@ -535,7 +566,7 @@ class RealtimeClient(RealtimeEventHandler):
                         "item": {
                             "type": "function_call_output",
                             "call_id": tool["call_id"],
-                            "output": json.dumps({"error": str(e)}),
+                            "output": orjson.dumps({"error": str(e)}).decode(),
                         }
                     },
                 )
@@ -563,6 +594,9 @@ class RealtimeClient(RealtimeEventHandler):
     async def connect(self):
         if self.is_connected():
             raise Exception("Already connected, use .disconnect() first")
+        # Drop whatever a dead earlier session left behind (session_created,
+        # conversation items, input audio, the closed socket) before reconnecting
+        await self.disconnect()
         await self.realtime.connect()
         await self.update_session()
         return True
@@ -570,15 +604,17 @@ class RealtimeClient(RealtimeEventHandler):
     async def wait_for_session_created(self):
         if not self.is_connected():
             raise Exception("Not connected, use .connect() first")
-        while not self.session_created:
-            await asyncio.sleep(0.001)
+        # Woken by _on_session_created instead of polling every millisecond
+        await self._session_created_event.wait()
         return True
 
     async def disconnect(self):
         self.session_created = False
+        self._session_created_event.clear()
         self.conversation.clear()
-        if self.realtime.is_connected():
-            await self.realtime.disconnect()
+        self.input_audio_buffer = bytearray()
+        # Also closes a socket the server already dropped (is_connected() is False then)
+        await self.realtime.disconnect()
 
     def get_turn_detection_type(self):
         return self.session_config.get("turn_detection", {}).get("type")
@@ -647,7 +683,10 @@ class RealtimeClient(RealtimeEventHandler):
             await self.realtime.send(
                 "input_audio_buffer.append",
                 {
-                    "audio": array_buffer_to_base64(np.array(array_buffer)),
+                    # Raw PCM bytes are encoded as-is, without a numpy round-trip
+                    "audio": base64.b64encode(array_buffer).decode()
+                    if isinstance(array_buffer, (bytes, bytearray))
+                    else array_buffer_to_base64(np.array(array_buffer)),
                 },
             )
             self.input_audio_buffer.extend(array_buffer)
@@ -1,9 +1,24 @@
 """
 Cancellation service routes and utilities
 """
+import os
+import asyncio
+import hashlib
 from datetime import datetime
+from functools import lru_cache
+from typing import Dict, Optional
+from pathlib import Path
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, select_autoescape
 from chainlit.logger import logger
-from db.connection import get_db_connection
+from db.queries import get_pending_box_request, cancel_box_request
+from db.cache import invalidate_account
+
+TEMPLATES_DIR = Path(__file__).resolve().parent.parent / "templates"
+IS_PROD = os.getenv("ENV", "dev").lower() in ("prod", "production")
+JINJA_CACHE_DIR = os.getenv("JINJA_CACHE_DIR", "/tmp/jinja_cache")
+
+# Token pages carry customer details and change once cancelled - never cache
+NO_STORE_HEADERS = {"Cache-Control": "no-store"}
 
 
 def format_date(date_value):
@@ -17,12 +32,12 @@ def format_date(date_value):
             try:
                 dt = datetime.fromisoformat(date_value.replace('Z', '+00:00'))
                 return dt.strftime('%B %d, %Y at %I:%M %p')
-            except:
+            except ValueError:
                 for fmt in ['%Y-%m-%d %H:%M:%S', '%Y-%m-%d', '%Y-%m-%dT%H:%M:%S']:
                     try:
                         dt = datetime.strptime(date_value, fmt)
                         return dt.strftime('%B %d, %Y at %I:%M %p')
-                    except:
+                    except ValueError:
                         continue
                 return str(date_value)
         return str(date_value)
@@ -31,187 +46,123 @@ def format_date(date_value):
         return str(date_value) if date_value else 'N/A'
 
 
+def _bytecode_cache() -> Optional[FileSystemBytecodeCache]:
+    """On-disk bytecode cache so restarted workers skip recompiling templates"""
+    if not IS_PROD:
+        return None
+    try:
+        os.makedirs(JINJA_CACHE_DIR, exist_ok=True)
+        return FileSystemBytecodeCache(JINJA_CACHE_DIR)
+    except OSError as e:
+        logger.warning(f"⚠️ Jinja bytecode cache disabled ({JINJA_CACHE_DIR}): {e}")
+        return None
+
+
+# In production templates are compiled once per worker and never re-checked on
+# disk; in dev (ENV unset) edits to templates/ are picked up on the next render
+_JINJA = Environment(
+    loader=FileSystemLoader(TEMPLATES_DIR),
+    auto_reload=not IS_PROD,
+    cache_size=-1 if IS_PROD else 400,
+    bytecode_cache=_bytecode_cache(),
+    autoescape=select_autoescape(["html"]),
+)
+_JINJA.filters["format_date"] = format_date
+
+
+def render_page(template_name: str, **context) -> str:
+    """Render one of the cancellation page templates"""
+    return _JINJA.get_template(template_name).render(**context)
+
+
+@lru_cache(maxsize=None)
+def _static_page_bytes(template_name: str) -> bytes:
+    return render_page(template_name).encode()
+
+
+def static_page(template_name: str) -> bytes:
+    """Encoded body of a page with no variables - rendered once in production"""
+    if IS_PROD:
+        return _static_page_bytes(template_name)
+    return render_page(template_name).encode()
+
+
+# Lookups in flight per token - a double-clicked email link shares one query
+_inflight: Dict[str, asyncio.Task] = {}
+
+
+def _forget_inflight(token: str, task: asyncio.Task):
+    if _inflight.get(token) is task:
+        del _inflight[token]
+    if not task.cancelled():
+        task.exception()  # mark retrieved even if every caller went away
+
+
+async def get_pending_request_once(token: str) -> Optional[Dict]:
+    """get_pending_box_request, coalescing concurrent calls for the same token"""
+    task = _inflight.get(token)
+    if task is None:
+        task = asyncio.ensure_future(get_pending_box_request(token))
+        _inflight[token] = task
+        task.add_done_callback(lambda t: _forget_inflight(token, t))
+    # Shielded so one disconnected client doesn't cancel the others' lookup
+    return await asyncio.shield(task)
+
+
 def register_cancellation_routes(app):
     """Register cancellation routes with FastAPI app"""
-    from fastapi.responses import HTMLResponse
+    from fastapi import Request
+    from fastapi.responses import HTMLResponse, Response
+    
+    def keep_page():
+        body = static_page("cancel_kept.html")
+        headers = {
+            "ETag": f'"{hashlib.sha1(body).hexdigest()[:16]}"',
+            "Cache-Control": "public, max-age=300",
+        }
+        return HTMLResponse(body, headers=headers)
+    
+    # Fully static - in production every hit reuses one response object
+    keep_response = keep_page() if IS_PROD else None
     
     @app.get("/cancel/{token}", response_class=HTMLResponse)
     async def cancel_request_form(token: str):
         """Show cancellation confirmation form"""
-        conn = get_db_connection()
-        if not conn:
-            return HTMLResponse("""
-            <html>
-                <body style="font-family: Arial, sans-serif; padding: 40px; max-width: 600px; margin: 0 auto;">
-                    <div style="background-color: #f8d7da; border-left: 4px solid #dc3545; padding: 20px; border-radius: 4px;">
-                        <h2 style="color: #721c24; margin: 0;">❌ Database Connection Error</h2>
-                    </div>
-                    <p>Unable to connect to the database. Please try again later.</p>
-                </body>
-            </html>
-            """, status_code=500)
-        
         try:
-            cursor = conn.cursor()
-            cursor.execute(
-                """
-                SELECT 
-                    br.*,
-                    c.customer_name,
-                    c.company_name,
-                    c.account_number
-                FROM box_requests br
-                JOIN ironmountain_customers c ON br.account_number = c.account_number
-                WHERE br.cancellation_token = ? 
-                AND br.status = 'pending'
-                AND br.cancelled_at IS NULL
-                """,
-                (token,)
-            )
-            row = cursor.fetchone()
-            request_data = dict(row) if row else None
-            cursor.close()
-            conn.close()
-            
+            request_data = await get_pending_request_once(token)
             if not request_data:
-                return HTMLResponse("""
-                <html>
-                    <body style="font-family: Arial, sans-serif; padding: 40px; max-width: 600px; margin: 0 auto;">
-                        <div style="background-color: #f8d7da; border-left: 4px solid #dc3545; padding: 20px; border-radius: 4px; margin-bottom: 20px;">
-                            <h2 style="color: #721c24; margin: 0;">❌ Request Not Found</h2>
-                        </div>
-                        <p>This cancellation link is invalid or has already been used.</p>
-                    </body>
-                </html>
-                """)
+                return HTMLResponse(static_page("cancel_not_found.html"), headers=NO_STORE_HEADERS)
             
-            return HTMLResponse(f"""
-            <html>
-                <body style="font-family: Arial, sans-serif; padding: 40px; max-width: 600px; margin: 0 auto; background-color: #f5f5f5;">
-                    <div style="background-color: white; padding: 30px; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1);">
-                        <h1 style="color: #0066cc; margin: 0;">Iron Mountain</h1>
-                        <div style="background-color: #fff3cd; border-left: 4px solid #ffc107; padding: 20px; border-radius: 4px; margin: 20px 0;">
-                            <h2 style="color: #856404; margin: 0;">⚠️ Cancel Box Request?</h2>
-                        </div>
-                        <p>Dear {request_data['customer_name']},</p>
-                        <p>You are about to cancel the following box request:</p>
-                        <div style="background-color: #f8f9fa; padding: 20px; border-radius: 4px; margin: 20px 0;">
-                            <p><strong>Account:</strong> {request_data['account_number']}</p>
-                            <p><strong>Quantity:</strong> {request_data['quantity']} boxes</p>
-                            <p><strong>Request Date:</strong> {format_date(request_data.get('created_at'))}</p>
-                        </div>
-                        <form method="POST" action="/cancel/{token}/confirm" style="margin-top: 30px;">
-                            <button type="submit" style="background-color: #dc3545; color: white; border: none; padding: 12px 30px; border-radius: 4px; cursor: pointer; font-size: 16px; font-weight: bold;">
-                                Yes, Cancel Request
-                            </button>
-                            <a href="/cancel/{token}/cancel-action" style="background-color: #6c757d; color: white; text-decoration: none; padding: 12px 30px; border-radius: 4px; font-size: 16px; font-weight: bold; display: inline-block; margin-left: 15px;">
-                                Keep Request
-                            </a>
-                        </form>
-                    </div>
-                </body>
-            </html>
-            """)
+            return HTMLResponse(render_page("cancel_form.html", request_data=request_data, token=token), headers=NO_STORE_HEADERS)
         except Exception as e:
-            conn.close()
             logger.error(f"Error processing cancellation request: {e}")
-            return HTMLResponse(f"<html><body><h1>Error</h1><p>{str(e)}</p></body></html>", status_code=500)
+            return HTMLResponse(render_page("cancel_error.html", error=str(e)), status_code=500, headers=NO_STORE_HEADERS)
     
     @app.post("/cancel/{token}/confirm", response_class=HTMLResponse)
     async def confirm_cancellation(token: str):
         """Confirm and process cancellation"""
-        conn = get_db_connection()
-        if not conn:
-            return HTMLResponse("""
-            <html>
-                <body style="font-family: Arial, sans-serif; padding: 40px; max-width: 600px; margin: 0 auto;">
-                    <h2>❌ Cancellation Failed</h2>
-                    <p>Database connection failed.</p>
-                </body>
-            </html>
-            """, status_code=500)
+        try:
+            request_data = await cancel_box_request(token)
+        except Exception as e:
+            logger.error(f"Error cancelling request: {e}")
+            return HTMLResponse(render_page("cancel_error.html", error=str(e)), status_code=500, headers=NO_STORE_HEADERS)
+        
+        if not request_data:
+            return HTMLResponse(static_page("cancel_failed.html"), headers=NO_STORE_HEADERS)
         
         try:
-            cursor = conn.cursor()
-            cursor.execute(
-                """
-                SELECT * FROM box_requests 
-                WHERE cancellation_token = ? 
-                AND status = 'pending'
-                AND cancelled_at IS NULL
-                """,
-                (token,)
-            )
-            row = cursor.fetchone()
-            request_data = dict(row) if row else None
-            
-            if not request_data:
-                cursor.close()
-                conn.close()
-                return HTMLResponse("""
-                <html>
-                    <body style="font-family: Arial, sans-serif; padding: 40px; max-width: 600px; margin: 0 auto;">
-                        <h2>❌ Cancellation Failed</h2>
-                        <p>Request not found or already cancelled.</p>
-                    </body>
-                </html>
-                """)
-            
-            # Mark as cancelled
-            cursor.execute(
-                """
-                UPDATE box_requests 
-                SET status = 'cancelled',
-                    cancelled_at = ?
-                WHERE cancellation_token = ?
-                """,
-                (datetime.now().isoformat(), token)
-            )
-            
-            # Update customer's boxes_requested count
-            cursor.execute(
-                """
-                UPDATE ironmountain_customers
-                SET boxes_requested = boxes_requested - ?
-                WHERE account_number = ?
-                """,
-                (request_data['quantity'], request_data['account_number'])
-            )
-            
-            conn.commit()
-            cursor.close()
-            conn.close()
+            await invalidate_account(request_data['account_number'])
             
-            return HTMLResponse(f"""
-            <html>
-                <body style="font-family: Arial, sans-serif; padding: 40px; max-width: 600px; margin: 0 auto; background-color: #f5f5f5;">
-                    <div style="background-color: white; padding: 30px; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1);">
-                        <h1 style="color: #0066cc; margin: 0;">Iron Mountain</h1>
-                        <div style="background-color: #d4edda; border-left: 4px solid #28a745; padding: 20px; border-radius: 4px; margin: 20px 0; text-align: center;">
-                            <h2 style="color: #155724; margin: 0;">✅ Request Cancelled Successfully</h2>
-                        </div>
-                        <p>Your request for <strong>{request_data['quantity']} boxes</strong> (Account: {request_data['account_number']}) has been cancelled.</p>
-                    </div>
-                </body>
-            </html>
-            """)
+            return HTMLResponse(render_page("cancel_success.html", request_data=request_data), headers=NO_STORE_HEADERS)
         except Exception as e:
-            conn.rollback()
-            cursor.close()
-            conn.close()
             logger.error(f"Error cancelling request: {e}")
-            return HTMLResponse(f"<html><body><h1>Error</h1><p>{str(e)}</p></body></html>", status_code=500)
+            return HTMLResponse(render_page("cancel_error.html", error=str(e)), status_code=500, headers=NO_STORE_HEADERS)
     
     @app.get("/cancel/{token}/cancel-action", response_class=HTMLResponse)
-    async def cancel_action(token: str):
+    async def cancel_action(token: str, request: Request):
         """User clicked 'Keep Request'"""
-        return HTMLResponse("""
-        <html>
-            <body style="font-family: Arial, sans-serif; padding: 40px; max-width: 600px; margin: 0 auto; background-color: #f5f5f5;">
-                <div style="background-color: white; padding: 30px; border-radius: 8px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); text-align: center;">
-                    <h2>✅ Request Maintained</h2>
-                    <p>Your box request will continue to be processed as scheduled.</p>
-                </div>
-            </body>
-        </html>
-        """)
+        response = keep_response or keep_page()
+        etag = response.headers["etag"]
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": response.headers["cache-control"]})
+        return response
@@ -2,13 +2,17 @@
 Email service for Iron Mountain using Resend API (primary) or SMTP (fallback)
 """
 import os
+import uuid
+import asyncio
+from contextlib import asynccontextmanager
 from pathlib import Path
 from dotenv import load_dotenv
 from datetime import datetime
+import httpx
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from typing import Optional, List
+from typing import Optional, List, Tuple
 from chainlit.logger import logger
 
 # Try to import Resend
@@ -19,6 +23,21 @@ except ImportError:
     RESEND_AVAILABLE = False
     logger.warning("Resend not available. Install with: pip install resend")
 
+# Try to import aiosmtplib (pooled async SMTP)
+try:
+    import aiosmtplib
+    AIOSMTPLIB_AVAILABLE = True
+except ImportError:
+    AIOSMTPLIB_AVAILABLE = False
+    logger.warning("aiosmtplib not available, async sends will use smtplib in a thread. Install with: pip install aiosmtplib")
+
+# HTTP/2 for the Resend client needs the optional h2 package (httpx[http2])
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
 # Load environment variables from .env file
 env_path = Path(__file__).parent.parent.parent / '.env'
 load_dotenv(env_path)
@@ -36,13 +55,76 @@ SMTP_FROM_EMAIL = os.getenv("SMTP_FROM_EMAIL", "")
 SMTP_FROM_NAME = os.getenv("SMTP_FROM_NAME", "Iron Mountain")
 TO_EMAIL = os.getenv("TO_EMAIL", "")  # All emails sent to this address
 CANCEL_BASE_URL = os.getenv("CANCEL_BASE_URL", "http://localhost:8002 ")
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "4"))
+RESEND_API_URL = "https://api.resend.com"
+RESEND_MAX_ATTEMPTS = 3
+RESEND_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
 
+# Common email providers whose domains can't be verified with Resend
+UNVERIFIED_SENDER_DOMAINS = frozenset({'gmail.com', 'yahoo.com', 'hotmail.com', 'outlook.com', 'aol.com'})
 
-def _send_email_resend(
+
+class TransientEmailError(Exception):
+    """A send failed in a way worth retrying (only raised with raise_transient=True)"""
+
+
+def _is_transient(error: Exception) -> bool:
+    """Network errors, SMTP 4xx replies and Resend 429/5xx are worth retrying; bad config or rejections aren't"""
+    if isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+        return True
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    # Other SMTPExceptions (refused recipients, unsupported commands) are OSErrors
+    # too, but retrying won't change the answer
+    if isinstance(error, smtplib.SMTPException):
+        return False
+    if isinstance(error, OSError):
+        return True
+    return getattr(error, "code", None) in RESEND_RETRY_STATUSES
+
+
+def _resend_params(
     to_email: str,
     subject: str,
     body_html: str,
     body_text: Optional[str] = None
+) -> dict:
+    """Build the Resend send-email payload"""
+    # Resend requires verified domains. Gmail/Yahoo/etc won't work.
+    # Use Resend's test domain for unverified emails
+    if SMTP_FROM_EMAIL and '@' in SMTP_FROM_EMAIL:
+        from_domain = SMTP_FROM_EMAIL.split('@')[1]
+        if from_domain.lower() in UNVERIFIED_SENDER_DOMAINS:
+            # Use Resend's test domain instead
+            from_email = "onboarding@resend.dev"
+            logger.info(f"📧 Using Resend test domain (from_email {SMTP_FROM_EMAIL} domain not verified)")
+        else:
+            from_email = SMTP_FROM_EMAIL
+    else:
+        from_email = "onboarding@resend.dev"  # Resend default for testing
+    
+    from_name = SMTP_FROM_NAME or "Iron Mountain"
+    
+    # Create email params
+    params = {
+        "from": f"{from_name} <{from_email}>",
+        "to": [to_email],
+        "subject": subject,
+        "html": body_html,
+    }
+    
+    # Add text version if provided
+    if body_text:
+        params["text"] = body_text
+    return params
+
+
+def _send_email_resend(
+    to_email: str,
+    subject: str,
+    body_html: str,
+    body_text: Optional[str] = None,
+    raise_transient: bool = False
 ) -> bool:
     """Send email using Resend API (simple, no domain verification needed)"""
     if not RESEND_AVAILABLE:
@@ -55,35 +137,7 @@ def _send_email_resend(
     try:
         # Initialize Resend
         resend.api_key = RESEND_API_KEY
-        
-        # Resend requires verified domains. Gmail/Yahoo/etc won't work.
-        # Use Resend's test domain for unverified emails
-        if SMTP_FROM_EMAIL and '@' in SMTP_FROM_EMAIL:
-            from_domain = SMTP_FROM_EMAIL.split('@')[1]
-            # Check if it's a common email provider that can't be verified
-            unverified_domains = ['gmail.com', 'yahoo.com', 'hotmail.com', 'outlook.com', 'aol.com']
-            if from_domain.lower() in unverified_domains:
-                # Use Resend's test domain instead
-                from_email = "onboarding@resend.dev"
-                logger.info(f"📧 Using Resend test domain (from_email {SMTP_FROM_EMAIL} domain not verified)")
-            else:
-                from_email = SMTP_FROM_EMAIL
-        else:
-            from_email = "onboarding@resend.dev"  # Resend default for testing
-        
-        from_name = SMTP_FROM_NAME or "Iron Mountain"
-        
-        # Create email params
-        params = {
-            "from": f"{from_name} <{from_email}>",
-            "to": [to_email],
-            "subject": subject,
-            "html": body_html,
-        }
-        
-        # Add text version if provided
-        if body_text:
-            params["text"] = body_text
+        params = _resend_params(to_email, subject, body_html, body_text)
         
         # Send email
         email_response = resend.Emails.send(params)
@@ -97,18 +151,77 @@ def _send_email_resend(
             
     except Exception as e:
         logger.error(f"❌ Resend error: {e}", exc_info=True)
+        if raise_transient and _is_transient(e):
+            raise TransientEmailError(str(e)) from e
         return False
 
 
-def _send_email_smtp(
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get the process-wide Resend HTTP client, creating it on first use"""
+    global _http_client
+    
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            base_url=RESEND_API_URL,
+            headers={"Authorization": f"Bearer {RESEND_API_KEY}"},
+            timeout=10,
+            # Limits go on the transport - the client ignores its own when given one.
+            # Retries cover failed connects only - the request never reached Resend
+            transport=httpx.AsyncHTTPTransport(
+                http2=HTTP2_AVAILABLE,
+                limits=httpx.Limits(max_keepalive_connections=20, keepalive_expiry=60),
+                retries=2,
+            ),
+        )
+    return _http_client
+
+
+async def close_http_client():
+    """Close the Resend HTTP client (called from the FastAPI lifespan shutdown)"""
+    global _http_client
+    
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+async def _send_email_resend_async(
     to_email: str,
     subject: str,
     body_html: str,
-    body_text: Optional[str] = None,
-    cc: Optional[List[str]] = None,
-    bcc: Optional[List[str]] = None
+    body_text: Optional[str] = None
 ) -> bool:
-    """Send email using SMTP (fallback for local development)"""
+    """Send email through the Resend REST API over a keep-alive connection"""
+    if not RESEND_API_KEY:
+        logger.warning("RESEND_API_KEY not set, skipping Resend")
+        return False
+    
+    try:
+        params = _resend_params(to_email, subject, body_html, body_text)
+        # Same key on every attempt so Resend never sends a retried email twice
+        headers = {"Idempotency-Key": uuid.uuid4().hex}
+        for attempt in range(1, RESEND_MAX_ATTEMPTS + 1):
+            response = await get_http_client().post("/emails", json=params, headers=headers)
+            if response.status_code not in RESEND_RETRY_STATUSES or attempt == RESEND_MAX_ATTEMPTS:
+                break
+            logger.warning(f"⚠️ Resend returned {response.status_code}, retrying ({attempt}/{RESEND_MAX_ATTEMPTS})")
+            await asyncio.sleep(0.1 * 2 ** (attempt - 1))
+        response.raise_for_status()
+        logger.info(f"✅ Email sent via Resend to {to_email} (id: {response.json().get('id')})")
+        return True
+    except httpx.HTTPStatusError as e:
+        logger.error(f"❌ Resend error: {e.response.status_code} {e.response.text}")
+        return False
+    except Exception as e:
+        logger.error(f"❌ Resend error: {e}", exc_info=True)
+        return False
+
+
+def _smtp_configured() -> bool:
+    """Check that SMTP credentials and sender are set"""
     if not SMTP_USER or not SMTP_PASSWORD:
         logger.warning("SMTP credentials not configured")
         return False
@@ -116,31 +229,54 @@ def _send_email_smtp(
     if not SMTP_FROM_EMAIL:
         logger.warning("SMTP_FROM_EMAIL not configured")
         return False
+    return True
+
+
+def _build_message(
+    to_email: str,
+    subject: str,
+    body_html: str,
+    body_text: Optional[str] = None,
+    cc: Optional[List[str]] = None,
+    bcc: Optional[List[str]] = None
+) -> Tuple[MIMEMultipart, List[str]]:
+    """Build the MIME message and its recipients list (to + cc + bcc)"""
+    msg = MIMEMultipart('alternative')
+    msg['From'] = f"{SMTP_FROM_NAME} <{SMTP_FROM_EMAIL}>"
+    msg['To'] = to_email
+    msg['Subject'] = subject
+    
+    if cc:
+        msg['Cc'] = ', '.join(cc)
+    
+    recipients = [to_email]
+    if cc:
+        recipients.extend(cc)
+    if bcc:
+        recipients.extend(bcc)
+    
+    # Add text and HTML parts
+    if body_text:
+        msg.attach(MIMEText(body_text, 'plain'))
+    msg.attach(MIMEText(body_html, 'html'))
+    return msg, recipients
+
+
+def _send_email_smtp(
+    to_email: str,
+    subject: str,
+    body_html: str,
+    body_text: Optional[str] = None,
+    cc: Optional[List[str]] = None,
+    bcc: Optional[List[str]] = None,
+    raise_transient: bool = False
+) -> bool:
+    """Send email using SMTP (fallback for local development)"""
+    if not _smtp_configured():
+        return False
     
     try:
-        # Create message
-        msg = MIMEMultipart('alternative')
-        msg['From'] = f"{SMTP_FROM_NAME} <{SMTP_FROM_EMAIL}>"
-        msg['To'] = to_email
-        msg['Subject'] = subject
-        
-        if cc:
-            msg['Cc'] = ', '.join(cc)
-        
-        # Create recipients list (to + cc + bcc)
-        recipients = [to_email]
-        if cc:
-            recipients.extend(cc)
-        if bcc:
-            recipients.extend(bcc)
-        
-        # Add text and HTML parts
-        if body_text:
-            text_part = MIMEText(body_text, 'plain')
-            msg.attach(text_part)
-        
-        html_part = MIMEText(body_html, 'html')
-        msg.attach(html_part)
+        msg, recipients = _build_message(to_email, subject, body_html, body_text, cc, bcc)
         
         # Connect to SMTP server and send
         logger.info(f"🔌 Connecting to SMTP server: {SMTP_HOST}:{SMTP_PORT}")
@@ -158,8 +294,12 @@ def _send_email_smtp(
         except OSError as e:
             logger.error(f"❌ Network error connecting to SMTP server: {e}")
             logger.error(f"   This might be due to Railway blocking outbound SMTP connections.")
+            if raise_transient and _is_transient(e):
+                raise TransientEmailError(str(e)) from e
             return False
         
+    except TransientEmailError:
+        raise
     except smtplib.SMTPAuthenticationError as e:
         logger.error(f"❌ SMTP Authentication failed: {e}")
         return False
@@ -171,13 +311,120 @@ def _send_email_smtp(
         return False
 
 
-def send_email(
+class SMTPPool:
+    """
+    Pool of logged-in aiosmtplib connections
+    
+    Connections are opened on first use, checked with NOOP when taken from the
+    pool and kept open between sends, so only the first send pays for
+    connect + STARTTLS + AUTH.
+    """
+    
+    def __init__(self, size: int = SMTP_POOL_SIZE):
+        self._idle: asyncio.Queue = asyncio.Queue(maxsize=size)
+        self._slots = asyncio.Semaphore(size)
+    
+    async def _open(self):
+        smtp = aiosmtplib.SMTP(hostname=SMTP_HOST, port=SMTP_PORT, timeout=10)
+        await smtp.connect()
+        await smtp.login(SMTP_USER, SMTP_PASSWORD)
+        logger.info(f"✅ Opened pooled SMTP connection to {SMTP_HOST}:{SMTP_PORT}")
+        return smtp
+    
+    async def _take_idle(self):
+        """Return a live idle connection, dropping any the server has closed"""
+        while not self._idle.empty():
+            smtp = self._idle.get_nowait()
+            try:
+                await smtp.noop()
+                return smtp
+            except Exception:
+                smtp.close()
+        return None
+    
+    @asynccontextmanager
+    async def acquire(self):
+        """Borrow a connection; it goes back to the pool unless the send failed"""
+        async with self._slots:
+            smtp = await self._take_idle() or await self._open()
+            try:
+                yield smtp
+            except BaseException:
+                smtp.close()
+                raise
+            self._idle.put_nowait(smtp)
+    
+    async def close(self):
+        """Quit all idle connections"""
+        while not self._idle.empty():
+            smtp = self._idle.get_nowait()
+            try:
+                await smtp.quit()
+            except Exception:
+                smtp.close()
+
+
+_smtp_pool: Optional[SMTPPool] = None
+
+
+def get_smtp_pool() -> SMTPPool:
+    """Get the process-wide SMTP pool, creating it on first use"""
+    global _smtp_pool
+    
+    if _smtp_pool is None:
+        _smtp_pool = SMTPPool()
+    return _smtp_pool
+
+
+async def close_smtp_pool():
+    """Close pooled SMTP connections (called from the FastAPI lifespan shutdown)"""
+    global _smtp_pool
+    
+    if _smtp_pool is not None:
+        await _smtp_pool.close()
+        _smtp_pool = None
+
+
+async def _send_email_smtp_async(
     to_email: str,
     subject: str,
     body_html: str,
     body_text: Optional[str] = None,
     cc: Optional[List[str]] = None,
     bcc: Optional[List[str]] = None
+) -> bool:
+    """Send email over a pooled aiosmtplib connection"""
+    if not AIOSMTPLIB_AVAILABLE:
+        return await asyncio.to_thread(_send_email_smtp, to_email, subject, body_html, body_text, cc, bcc)
+    
+    if not _smtp_configured():
+        return False
+    
+    try:
+        msg, recipients = _build_message(to_email, subject, body_html, body_text, cc, bcc)
+        async with get_smtp_pool().acquire() as smtp:
+            await smtp.send_message(msg, recipients=recipients)
+        logger.info(f"✅ Email sent successfully via SMTP to {to_email}")
+        return True
+    except aiosmtplib.SMTPAuthenticationError as e:
+        logger.error(f"❌ SMTP Authentication failed: {e}")
+        return False
+    except (aiosmtplib.SMTPException, OSError) as e:
+        logger.error(f"❌ SMTP error: {e}")
+        return False
+    except Exception as e:
+        logger.error(f"❌ Error sending email via SMTP: {e}", exc_info=True)
+        return False
+
+
+def send_email(
+    to_email: str,
+    subject: str,
+    body_html: str,
+    body_text: Optional[str] = None,
+    cc: Optional[List[str]] = None,
+    bcc: Optional[List[str]] = None,
+    raise_transient: bool = False
 ) -> bool:
     """
     Send email using Resend API (preferred) or SMTP (fallback)
@@ -189,6 +436,8 @@ def send_email(
         body_text: Plain text email body (optional, will be generated from HTML if not provided)
         cc: List of CC email addresses (optional, only works with SMTP)
         bcc: List of BCC email addresses (optional, only works with SMTP)
+        raise_transient: Raise TransientEmailError instead of returning False
+            when a transport failed in a retryable way (used by the Celery job)
     
     Returns:
         True if email sent successfully, False otherwise
@@ -201,40 +450,66 @@ def send_email(
     
     logger.info(f"📧 Sending email to {actual_to_email} (original recipient was {to_email})")
     
+    # A retryable failure on either transport is raised only if the other doesn't deliver
+    transient = None
+    
     # Try Resend first (works on Railway, no domain verification needed)
     if RESEND_AVAILABLE and RESEND_API_KEY:
         logger.info("📧 Using Resend API")
-        if _send_email_resend(actual_to_email, subject, body_html, body_text):
-            return True
+        try:
+            if _send_email_resend(actual_to_email, subject, body_html, body_text, raise_transient):
+                return True
+        except TransientEmailError as e:
+            transient = e
         logger.warning("⚠️ Resend failed, falling back to SMTP")
     
     # Fallback to SMTP (for local development)
     logger.info("📧 Using SMTP (fallback)")
-    return _send_email_smtp(actual_to_email, subject, body_html, body_text, cc, bcc)
+    try:
+        sent = _send_email_smtp(actual_to_email, subject, body_html, body_text, cc, bcc, raise_transient)
+    except TransientEmailError as e:
+        transient, sent = e, False
+    if not sent and transient is not None:
+        raise transient
+    return sent
 
 
-def send_box_request_confirmation(
-    customer_email: str,
-    customer_name: str,
-    account_number: str,
-    quantity: int,
-    address: str,
-    cancellation_token: Optional[str] = None
+async def send_email_async(
+    to_email: str,
+    subject: str,
+    body_html: str,
+    body_text: Optional[str] = None,
+    cc: Optional[List[str]] = None,
+    bcc: Optional[List[str]] = None
 ) -> bool:
     """
-    Send box request confirmation email to customer
-    
-    Args:
-        customer_email: Customer email address (will be overridden by TO_EMAIL from env)
-        customer_name: Customer name
-        account_number: Account number
-        quantity: Number of boxes requested
-        address: Delivery address
-        cancellation_token: Cancellation token for the request (optional)
+    Async variant of send_email - Resend goes through a shared httpx client
+    and SMTP through the shared SMTPPool
     
     Returns:
         True if email sent successfully, False otherwise
     """
+    actual_to_email = TO_EMAIL or to_email
+    if not actual_to_email:
+        logger.error("TO_EMAIL not configured. Set TO_EMAIL environment variable to receive emails.")
+        return False
+    
+    if RESEND_API_KEY:
+        if await _send_email_resend_async(actual_to_email, subject, body_html, body_text):
+            return True
+        logger.warning("⚠️ Resend failed, falling back to SMTP")
+    
+    return await _send_email_smtp_async(actual_to_email, subject, body_html, body_text, cc, bcc)
+
+
+def _box_request_confirmation_content(
+    customer_name: str,
+    account_number: str,
+    quantity: int,
+    address: str,
+    cancellation_token: Optional[str] = None
+) -> Tuple[str, str, str]:
+    """Build (subject, body_html, body_text) for the customer confirmation email"""
     subject = f"Iron Mountain - Box Request Confirmation ({account_number})"
     
     # Build cancellation link if token is provided
@@ -340,29 +615,57 @@ Iron Mountain Customer Service
 Iron Mountain | support@ironmountain.com | 1-800-899-IRON (4766)
     """
     
-    return send_email(customer_email, subject, body_html, body_text)
+    return subject, body_html, body_text
 
 
-def send_box_request_notification(
-    internal_email: str,
+def send_box_request_confirmation(
+    customer_email: str,
     customer_name: str,
     account_number: str,
     quantity: int,
-    address: str
+    address: str,
+    cancellation_token: Optional[str] = None,
+    raise_transient: bool = False
 ) -> bool:
     """
-    Send internal notification email for box request
+    Send box request confirmation email to customer
     
     Args:
-        internal_email: Internal team email address
+        customer_email: Customer email address (will be overridden by TO_EMAIL from env)
         customer_name: Customer name
         account_number: Account number
         quantity: Number of boxes requested
         address: Delivery address
+        cancellation_token: Cancellation token for the request (optional)
+        raise_transient: See send_email
     
     Returns:
         True if email sent successfully, False otherwise
     """
+    content = _box_request_confirmation_content(customer_name, account_number, quantity, address, cancellation_token)
+    return send_email(customer_email, *content, raise_transient=raise_transient)
+
+
+async def send_box_request_confirmation_async(
+    customer_email: str,
+    customer_name: str,
+    account_number: str,
+    quantity: int,
+    address: str,
+    cancellation_token: Optional[str] = None
+) -> bool:
+    """Async variant of send_box_request_confirmation"""
+    content = _box_request_confirmation_content(customer_name, account_number, quantity, address, cancellation_token)
+    return await send_email_async(customer_email, *content)
+
+
+def _box_request_notification_content(
+    customer_name: str,
+    account_number: str,
+    quantity: int,
+    address: str
+) -> Tuple[str, str, str]:
+    """Build (subject, body_html, body_text) for the internal notification email"""
     subject = f"New Box Request - {account_number} ({quantity} boxes)"
     
     body_html = f"""
@@ -415,4 +718,42 @@ Request Details:
 Please process this request and schedule delivery within 3-5 business days.
     """
     
-    return send_email(internal_email, subject, body_html, body_text)
+    return subject, body_html, body_text
+
+
+def send_box_request_notification(
+    internal_email: str,
+    customer_name: str,
+    account_number: str,
+    quantity: int,
+    address: str,
+    raise_transient: bool = False
+) -> bool:
+    """
+    Send internal notification email for box request
+    
+    Args:
+        internal_email: Internal team email address
+        customer_name: Customer name
+        account_number: Account number
+        quantity: Number of boxes requested
+        address: Delivery address
+        raise_transient: See send_email
+    
+    Returns:
+        True if email sent successfully, False otherwise
+    """
+    content = _box_request_notification_content(customer_name, account_number, quantity, address)
+    return send_email(internal_email, *content, raise_transient=raise_transient)
+
+
+async def send_box_request_notification_async(
+    internal_email: str,
+    customer_name: str,
+    account_number: str,
+    quantity: int,
+    address: str
+) -> bool:
+    """Async variant of send_box_request_notification"""
+    content = _box_request_notification_content(customer_name, account_number, quantity, address)
+    return await send_email_async(internal_email, *content)
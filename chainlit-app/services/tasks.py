@@ -0,0 +1,80 @@
+"""
+Background email jobs for Iron Mountain (Celery)
+
+Run a worker with:
+    celery -A services.tasks:celery_app worker --loglevel=info
+"""
+import os
+import asyncio
+from typing import Optional, Dict
+from chainlit.logger import logger
+from services.email import send_email, send_box_request_confirmation, send_box_request_notification, TransientEmailError
+
+# Try to import Celery
+try:
+    from celery import Celery
+    CELERY_AVAILABLE = True
+except ImportError:
+    Celery = None
+    CELERY_AVAILABLE = False
+    logger.warning("Celery not available. Install with: pip install celery[redis]")
+
+# Jobs are only queued when a broker is configured (Redis or RabbitMQ URL)
+CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "")
+
+# Same bound as the inline send path (seconds); the hard limit kills a job stuck past it
+EMAIL_TASK_SOFT_TIME_LIMIT = 10
+EMAIL_TASK_TIME_LIMIT = 15
+
+# Email senders a job can run, keyed by job kind
+EMAIL_SENDERS = {
+    "email": send_email,
+    "box_confirmation": send_box_request_confirmation,
+    "box_notification": send_box_request_notification,
+}
+
+celery_app = None
+send_email_task = None
+
+if CELERY_AVAILABLE and CELERY_BROKER_URL:
+    celery_app = Celery("ironmountain", broker=CELERY_BROKER_URL)
+
+    @celery_app.task(
+        bind=True,
+        autoretry_for=(TransientEmailError,),
+        retry_backoff=True,
+        max_retries=5,
+        soft_time_limit=EMAIL_TASK_SOFT_TIME_LIMIT,
+        time_limit=EMAIL_TASK_TIME_LIMIT,
+    )
+    def send_email_task(self, payload: Dict) -> bool:
+        """
+        Send one email job
+
+        Only network errors, SMTP 4xx and Resend 429/5xx are retried (with backoff).
+        Missing config or a rejected message returns False straight away.
+        """
+        sender = EMAIL_SENDERS[payload["kind"]]
+        return sender(**payload["kwargs"], raise_transient=True)
+
+
+async def enqueue_email(kind: str, **kwargs) -> Optional[str]:
+    """
+    Queue an email job on the Celery broker
+
+    Args:
+        kind: Job kind, one of EMAIL_SENDERS
+        **kwargs: Arguments for the matching email sender
+
+    Returns:
+        The Celery job id, or None if no broker is configured or publishing failed
+    """
+    if send_email_task is None:
+        return None
+
+    try:
+        result = await asyncio.to_thread(send_email_task.delay, {"kind": kind, "kwargs": kwargs})
+        return result.id
+    except Exception as e:
+        logger.error(f"❌ Failed to queue {kind} email job: {e}")
+        return None
@@ -4,7 +4,6 @@ Create SQLite database for Iron Mountain with schema and sample data
 """
 import sqlite3
 import os
-from datetime import datetime
 
 # Database file path
 DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'ironmountain.db')